@@ -0,0 +1,267 @@
+"""Backup sets: a `pg_dump` of the database plus incremental chunks.
+
+A backup set is a directory holding the dump, a `manifest.json` and gzip CSV
+chunks of the readings and users added since. The manifest keeps the
+high-water mark (hwm): the last reading id covered by the set. An
+incremental backup streams readings with ids above it into a new chunk and
+moves the mark. As in the rollups, readings newer than `settle` seconds are
+left for the next chunk so rows committed slightly out of id order are not
+skipped; a reading that ends up both in the dump and in a chunk is skipped
+when the chunk is restored.
+
+Readings reference their user, so each increment also carries the users
+created or changed since `users_since` (by `updated_at`). User chunks are
+restored first and in order, each row overwriting the previous version.
+"""
+
+import asyncio
+import csv
+import gzip
+import itertools
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .db import dialect_insert
+from .models import Reading, User
+from .partitions import COLUMNS, ArchiveFile
+
+MANIFEST = "manifest.json"
+CHUNK_ROWS = 5000
+USER_COLUMNS = (
+    "id",
+    "telegram_id",
+    "username",
+    "gender",
+    "language",
+    "created_at",
+    "updated_at",
+    "last_spontaneous_offer_date",
+    "last_spontaneous_at",
+)
+
+
+@dataclass
+class Manifest:
+    created_at: str
+    dump: str
+    format: str
+    hwm: int
+    chunks: list[str] = field(default_factory=list)
+    # Users changed at or after this time are not in the set yet; None means all.
+    users_since: str | None = None
+    user_chunks: list[str] = field(default_factory=list)
+
+    @classmethod
+    def read(cls, directory: Path) -> "Manifest":
+        return cls(**json.loads((directory / MANIFEST).read_text()))
+
+    def write(self, directory: Path) -> None:
+        partial = directory / (MANIFEST + ".partial")
+        partial.write_text(json.dumps(asdict(self), indent=2))
+        partial.replace(directory / MANIFEST)
+
+
+def latest_set(root: Path) -> Path | None:
+    """Newest backup set under `root`; set names sort by creation time."""
+    sets = sorted(path.parent for path in root.glob(f"*/{MANIFEST}"))
+    return sets[-1] if sets else None
+
+
+def pg_connection(database_url: str) -> tuple[list[str], dict[str, str], str]:
+    """Connection flags, environment and database name for pg_dump/pg_restore."""
+    url = make_url(database_url)
+    env = os.environ.copy()
+    if url.password:
+        env["PGPASSWORD"] = url.password
+    args = [
+        "-h",
+        url.host or "localhost",
+        "-p",
+        str(url.port or 5432),
+        "-U",
+        url.username or "postgres",
+    ]
+    return args, env, url.database or "postgres"
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def high_water_mark(engine: AsyncEngine, settle: float = 60.0) -> int:
+    """Last reading id that a dump taken now is certain to contain."""
+    settled_before = datetime.now(timezone.utc) - timedelta(seconds=settle)
+    async with engine.connect() as conn:
+        return await conn.scalar(
+            select(func.coalesce(func.max(Reading.id), 0)).where(
+                Reading.created_at < settled_before
+            )
+        )
+
+
+async def dump_readings(
+    engine: AsyncEngine,
+    path: Path,
+    *,
+    after: int,
+    settle: float = 60.0,
+    compresslevel: int = 6,
+) -> tuple[int, int]:
+    """Write settled readings with ids above `after` to `path`.
+
+    Returns the number of rows and the new high-water mark. Nothing is
+    written when there are no new settled readings.
+    """
+    settled_before = datetime.now(timezone.utc) - timedelta(seconds=settle)
+    table = Reading.__table__
+    chunk: ArchiveFile | None = None
+    hwm = after
+    async with engine.connect() as conn:
+        result = await conn.stream(
+            select(*(table.c[name] for name in COLUMNS))
+            .where(table.c.id > after)
+            .order_by(table.c.id),
+            execution_options={"yield_per": CHUNK_ROWS},
+        )
+        async for rows in result.partitions(CHUNK_ROWS):
+            settled = next(
+                (
+                    index
+                    for index, row in enumerate(rows)
+                    if _as_utc(row.created_at) >= settled_before
+                ),
+                len(rows),
+            )
+            if settled:
+                if chunk is None:
+                    chunk = ArchiveFile(path, compresslevel=compresslevel)
+                await chunk.write(
+                    [(*row[:-1], _as_utc(row.created_at).isoformat()) for row in rows[:settled]]
+                )
+                hwm = rows[settled - 1].id
+            if settled < len(rows):
+                break
+    if chunk is None:
+        return 0, after
+    await chunk.finish()
+    return chunk.rows, hwm
+
+
+def _csv_value(value: object) -> object:
+    return _as_utc(value).isoformat() if isinstance(value, datetime) else value
+
+
+async def dump_users(
+    engine: AsyncEngine,
+    path: Path,
+    *,
+    since: datetime | None,
+    compresslevel: int = 6,
+) -> int:
+    """Write users created or changed at or after `since` to `path`; 0 writes nothing."""
+    table = User.__table__
+    query = select(*(table.c[name] for name in USER_COLUMNS)).order_by(table.c.id)
+    if since is not None:
+        query = query.where(table.c.updated_at >= since)
+    chunk: ArchiveFile | None = None
+    async with engine.connect() as conn:
+        result = await conn.stream(query, execution_options={"yield_per": CHUNK_ROWS})
+        async for rows in result.partitions(CHUNK_ROWS):
+            if chunk is None:
+                chunk = ArchiveFile(path, compresslevel=compresslevel, columns=USER_COLUMNS)
+            await chunk.write([[_csv_value(value) for value in row] for row in rows])
+    if chunk is None:
+        return 0
+    await chunk.finish()
+    return chunk.rows
+
+
+def _optional(value: str, parse: Callable[[str], object] = str) -> object:
+    return parse(value) if value else None
+
+
+def _user_row(row: dict[str, str]) -> dict:
+    return {
+        "id": int(row["id"]),
+        "telegram_id": int(row["telegram_id"]),
+        "username": _optional(row["username"]),
+        "gender": _optional(row["gender"]),
+        "language": _optional(row["language"]),
+        "created_at": datetime.fromisoformat(row["created_at"]),
+        "updated_at": datetime.fromisoformat(row["updated_at"]),
+        "last_spontaneous_offer_date": _optional(
+            row["last_spontaneous_offer_date"], date.fromisoformat
+        ),
+        "last_spontaneous_at": _optional(row["last_spontaneous_at"], datetime.fromisoformat),
+    }
+
+
+def _reading_row(row: dict[str, str]) -> dict:
+    return {
+        "id": int(row["id"]),
+        "user_id": int(row["user_id"]),
+        "arcana_id": int(row["arcana_id"]),
+        "prediction_index": int(row["prediction_index"]),
+        "variant": int(row["variant"]),
+        "is_spontaneous": row["is_spontaneous"] == "True",
+        "created_at": datetime.fromisoformat(row["created_at"]),
+    }
+
+
+async def _load_chunk(
+    engine: AsyncEngine, path: Path, stmt, parse: Callable[[dict[str, str]], dict]  # noqa: ANN001
+) -> int:
+    """Execute `stmt` for the rows of a chunk, reading and inserting one batch at a time."""
+    rows = 0
+    stored = gzip.open(path, "rt", newline="", encoding="utf-8")
+    try:
+        reader = csv.DictReader(stored)
+
+        def next_batch() -> list[dict]:
+            return [parse(row) for row in itertools.islice(reader, CHUNK_ROWS)]
+
+        async with engine.begin() as conn:
+            while batch := await asyncio.to_thread(next_batch):
+                await conn.execute(stmt, batch)
+                rows += len(batch)
+    finally:
+        stored.close()
+    return rows
+
+
+async def load_readings(engine: AsyncEngine, path: Path) -> int:
+    """Insert the readings of a chunk, skipping ids that are already restored."""
+    stmt = dialect_insert(Reading).on_conflict_do_nothing()
+    return await _load_chunk(engine, path, stmt, _reading_row)
+
+
+async def load_users(engine: AsyncEngine, path: Path) -> int:
+    """Insert or overwrite the users of a chunk."""
+    stmt = dialect_insert(User)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.id],
+        set_={name: stmt.excluded[name] for name in USER_COLUMNS if name != "id"},
+    )
+    return await _load_chunk(engine, path, stmt, _user_row)
+
+
+async def reset_sequences(engine: AsyncEngine) -> None:
+    """Move the id sequences past restored users and readings (PostgreSQL)."""
+    if engine.dialect.name != "postgresql":
+        return
+    async with engine.begin() as conn:
+        for table in ("users", "readings"):
+            await conn.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT coalesce(max(id), 0) + 1 FROM {table}), false)"
+                )
+            )
@@ -1,67 +1,141 @@
 import asyncio
 import logging
+import signal
+from dataclasses import dataclass, replace
 from datetime import datetime, time, timedelta, timezone
-from random import choice
+from pathlib import Path
+from typing import Awaitable, Callable
 
 from aiogram import Bot, Dispatcher, F, types
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import Command
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-from sqlalchemy import func, select
-
-from .config import settings
-from .db import AsyncSessionLocal, init_db
-from .models import Reading, User
-from .locales.ru import (
-    ARCANA,
-    Arcana,
-    BUTTON_TEXTS,
-    DEFAULT_NAMES,
-    GENDER_LABELS,
-    GenderLiteral,
-    MESSAGES,
-    get_prediction,
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import false, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from . import catalog, diagnostics, metrics
+from .config import Settings, get_settings
+from .db import dialect_insert, get_engine, get_sessionmaker, init_db, pool_stats, warm_pool
+from .diagnostics import LoopMonitor, SamplingProfiler
+from .locales import DEFAULT_LOCALE, GenderLiteral, get_catalog, resolve_locale
+from .logs import configure_logging
+from .message_store import DatabaseLastMessageStore, LastMessageStore, create_last_message_store
+from .middlewares import (
+    BotAPIMetricsMiddleware,
+    CorrelationMiddleware,
+    DbSessionMiddleware,
+    HandlerMetricsMiddleware,
+    ReleaseSessionMiddleware,
+    release_session,
+    update_session,
 )
+from .models import Reading, User
+from .partitions import ReadingMaintenance
+from .pipeline import CallbackPipeline, TapGuard
+from .quota import DailyQuotaCache, utc_today
+from .reading_writer import PendingReading, ReadingWriter
+from .rollups import ReadingRollup, format_report, load_report
+from .scheduler import DeletionScheduler
+from .sender import PRIORITY_BROADCAST, PRIORITY_REPLY, OutboundLimiter
+from .spontaneous import SpontaneousScheduler
+from .user_cache import CachedUser, UserCache
+from .webhook import run_webhook
 
-log_level = logging.DEBUG if settings.debug else logging.INFO
-logging.basicConfig(
-    level=log_level,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-)
 logger = logging.getLogger(__name__)
 
 router = Dispatcher()
-
-
-GENDER_KEYBOARD = InlineKeyboardMarkup(
-    inline_keyboard=[
-        [InlineKeyboardButton(text=BUTTON_TEXTS["male"], callback_data="gender:male")],
-        [InlineKeyboardButton(text=BUTTON_TEXTS["female"], callback_data="gender:female")],
-    ]
-)
-
-READING_KEYBOARD = InlineKeyboardMarkup(
-    inline_keyboard=[
-        [
-            InlineKeyboardButton(
-                text=BUTTON_TEXTS["reading"], callback_data="reading"
+router.update.outer_middleware(CorrelationMiddleware())
+for observer in (router.message, router.callback_query):
+    observer.middleware(HandlerMetricsMiddleware())
+    observer.middleware(DbSessionMiddleware(lambda: get_app().sessionmaker()))
+
+
+DAILY_READING_LIMIT = 10
+EPHEMERAL_MESSAGE_TTL = 20
+
+
+@dataclass
+class BotApp:
+    """Process-wide state of the bot, built by `create_app`."""
+
+    settings: Settings
+    sessionmaker: async_sessionmaker[AsyncSession]
+    last_messages: LastMessageStore
+    quota: DailyQuotaCache
+    users: UserCache
+    deletions: DeletionScheduler
+    outbound: OutboundLimiter
+    writer: ReadingWriter | None
+    callbacks: CallbackPipeline
+    taps: TapGuard
+    profiler: SamplingProfiler
+
+
+_app: BotApp | None = None
+
+
+def create_app(config: Settings | None = None) -> BotApp:
+    """Build the caches, schedulers and limiters handlers use.
+
+    Nothing is created at import time; the database engine is opened here
+    on first use of the session factory.
+    """
+    global _app
+    config = config or get_settings()
+    sessionmaker = get_sessionmaker()
+    app = BotApp(
+        settings=config,
+        sessionmaker=sessionmaker,
+        last_messages=create_last_message_store(
+            config.last_message_store,
+            sessionmaker,
+            cache_size=config.last_message_cache_size,
+            # Workers and the front (configured with WORKERS) share the table.
+            shared=config.bot_mode == "worker" or bool(config.workers),
+        ),
+        quota=DailyQuotaCache(max_entries=config.quota_cache_size),
+        users=UserCache(max_entries=config.user_cache_size, ttl=config.user_cache_ttl),
+        deletions=DeletionScheduler(sessionmaker),
+        outbound=OutboundLimiter(
+            global_rate=config.outbound_global_rate,
+            chat_rate=config.outbound_chat_rate,
+            chat_burst=config.outbound_chat_burst,
+            max_retries=config.outbound_max_retries,
+        ),
+        writer=(
+            ReadingWriter(
+                sessionmaker,
+                batch_size=config.reading_batch_size,
+                flush_interval=config.reading_flush_interval,
+                max_pending=config.reading_queue_size,
+                synchronous_commit=config.reading_synchronous_commit,
             )
-        ]
-    ]
-)
-
-DRAW_CARD_KEYBOARD = InlineKeyboardMarkup(
-    inline_keyboard=[
-        [
-            InlineKeyboardButton(
-                text=BUTTON_TEXTS["draw_card"], callback_data="reading"
-            )
-        ]
-    ]
-)
+            if config.reading_write_behind
+            else None
+        ),
+        callbacks=CallbackPipeline(
+            workers=config.callback_workers, max_pending=config.callback_queue_size
+        ),
+        taps=TapGuard(window=config.tap_debounce, max_entries=config.tap_guard_size),
+        profiler=SamplingProfiler(Path(config.profile_dir), interval=config.profile_interval),
+    )
+    diagnostics.set_slow_update_threshold(config.slow_update_threshold)
+    metrics.register_collector("tarobot_db_pool", pool_stats)
+    metrics.register_collector("tarobot_outbound", app.outbound.stats)
+    metrics.register_collector("tarobot_deletions", app.deletions.stats)
+    metrics.register_collector("tarobot_user_cache", app.users.stats)
+    metrics.register_collector("tarobot_callbacks", app.callbacks.stats)
+    metrics.register_collector("tarobot_taps", app.taps.stats)
+    _app = app
+    return app
 
 
-_last_bot_messages: dict[int, int] = {}
+def get_app() -> BotApp:
+    if _app is None:
+        raise RuntimeError("create_app() has not been called")
+    return _app
 
 
 def _today_bounds() -> tuple[datetime, datetime]:
@@ -72,23 +146,15 @@ def _today_bounds() -> tuple[datetime, datetime]:
     return start, end
 
 
-def _display_name(user: User, telegram_user: types.User) -> str:
+def _display_name(user: CachedUser, telegram_user: types.User) -> str:
     if telegram_user.full_name:
         return telegram_user.full_name
     if telegram_user.username:
         return telegram_user.username
+    default_names = get_catalog(user.language).default_names
     if user.gender == "female":
-        return DEFAULT_NAMES["female"]
-    return DEFAULT_NAMES["male"]
-
-
-async def _delete_message_after(message: types.Message, delay: int = 20) -> None:
-    try:
-        await asyncio.sleep(delay)
-        await message.delete()
-        logger.debug("Deleted service message %s", message.message_id)
-    except Exception as exc:  # noqa: BLE001
-        logger.debug("Failed to delete message %s: %s", message.message_id, exc)
+        return default_names["female"]
+    return default_names["male"]
 
 
 async def _delete_message(
@@ -96,13 +162,29 @@ async def _delete_message(
 ) -> None:
     if not message_id or message_id == skip_id:
         return
-    try:
-        await bot.delete_message(chat_id, message_id)
-        logger.debug("Deleted message %s in chat %s", message_id, chat_id)
-    except Exception as exc:  # noqa: BLE001
-        logger.debug(
-            "Failed to delete message %s in chat %s: %s", message_id, chat_id, exc
-        )
+    get_app().outbound.delete(bot, chat_id, message_id)
+    logger.debug("Queued deletion of message %s in chat %s", message_id, chat_id)
+
+
+async def _replace_last_message(
+    bot: Bot,
+    chat_id: int,
+    text: str,
+    reply_markup: InlineKeyboardMarkup | None = None,
+    priority: int = PRIORITY_REPLY,
+) -> types.Message:
+    app = get_app()
+    # Do not hold a pooled connection while waiting on the rate limiter and Telegram.
+    await release_session()
+    await _delete_message(bot, chat_id, await app.last_messages.get(chat_id))
+
+    sent = await app.outbound.call(
+        chat_id,
+        lambda: bot.send_message(chat_id, text, reply_markup=reply_markup),
+        priority,
+    )
+    await app.last_messages.set(chat_id, sent.message_id)
+    return sent
 
 
 async def _send_single_message(
@@ -111,10 +193,7 @@ async def _send_single_message(
     bot = target.bot
     chat_id = target.chat.id
 
-    await _delete_message(bot, chat_id, _last_bot_messages.get(chat_id))
-
-    sent = await target.answer(text, reply_markup=reply_markup)
-    _last_bot_messages[chat_id] = sent.message_id
+    sent = await _replace_last_message(bot, chat_id, text, reply_markup=reply_markup)
 
     await _delete_message(bot, chat_id, target.message_id, skip_id=sent.message_id)
     return sent
@@ -124,190 +203,501 @@ async def _send_ephemeral(
     target: types.Message, text: str, reply_markup: InlineKeyboardMarkup | None = None
 ) -> None:
     sent = await _send_single_message(target, text, reply_markup=reply_markup)
-    asyncio.create_task(_delete_message_after(sent))
+    await get_app().deletions.schedule(
+        sent.chat.id, sent.message_id, delay=EPHEMERAL_MESSAGE_TTL
+    )
 
 
-async def _get_or_create_user(session, telegram_user: types.User) -> tuple[User, bool]:
-    stmt = select(User).where(User.telegram_id == telegram_user.id)
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
+async def _get_or_create_user(
+    session: AsyncSession, telegram_user: types.User
+) -> tuple[CachedUser, bool]:
+    """Return the user from the cache or upsert it in one round trip."""
     username = telegram_user.full_name or telegram_user.username
-
-    if user is None:
-        user = User(telegram_id=telegram_user.id, username=username)
-        session.add(user)
-        await session.commit()
-        await session.refresh(user)
+    users = get_app().users
+    cached = users.get(telegram_user.id, username)
+    if cached is not None:
+        return cached, False
+
+    now = datetime.now(timezone.utc)
+    insert_stmt = dialect_insert(User).values(
+        telegram_id=telegram_user.id,
+        username=username,
+        language=resolve_locale(telegram_user.language_code),
+        created_at=now,
+        updated_at=now,
+    )
+    stmt = (
+        insert_stmt.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                "username": func.coalesce(insert_stmt.excluded.username, User.username),
+                "language": func.coalesce(User.language, insert_stmt.excluded.language),
+                "updated_at": now,
+            },
+        )
+        .returning(User, (User.created_at == now).label("created"))
+        .execution_options(populate_existing=True)
+    )
+    result = await session.execute(stmt)
+    user, created = result.one()
+    if created:
         logger.info("Created user %s (%s)", telegram_user.id, username)
-        return user, True
-
-    updated = False
-    if username and user.username != username:
-        user.username = username
-        updated = True
-    if updated:
-        await session.commit()
-        await session.refresh(user)
-        logger.debug("Updated username for user %s to %s", telegram_user.id, username)
-    return user, False
+    return users.put(CachedUser.from_model(user)), bool(created)
 
 
-async def _send_reading_prompt(message: types.Message) -> None:
+async def _send_reading_prompt(message: types.Message, user: CachedUser) -> None:
+    texts = get_catalog(user.language)
     await _send_single_message(
-        message, MESSAGES["reading_cta"], reply_markup=READING_KEYBOARD
+        message, texts.messages["reading_cta"], reply_markup=texts.reading_keyboard
     )
 
 
 async def _count_today_readings(session, user_id: int) -> int:
+    app = get_app()
+    cached = app.quota.get(user_id)
+    if cached is not None:
+        return cached
+
     start, end = _today_bounds()
     stmt = (
         select(func.count(Reading.id))
         .where(Reading.user_id == user_id)
-        .where(Reading.is_spontaneous.is_(False))
+        .where(Reading.is_spontaneous == false())
         .where(Reading.created_at >= start)
         .where(Reading.created_at < end)
     )
     result = await session.execute(stmt)
     count = int(result.scalar_one())
+    if app.writer is not None:
+        count += app.writer.pending_regular(user_id, start.date())
+    app.quota.warm(user_id, count, day=start.date())
     logger.debug("User %s has %s readings today", user_id, count)
     return count
 
 
 async def _record_reading(
-    session, user: User, arcana: Arcana, prediction: str, is_spontaneous: bool = False
-) -> None:
-    reading = Reading(
-        user_id=user.id,
-        arcana=arcana.name,
-        prediction=prediction,
-        is_spontaneous=is_spontaneous,
+    session,
+    user: CachedUser,
+    card: catalog.Card,
+    is_spontaneous: bool = False,
+    limit: int | None = None,
+) -> int | None:
+    """Insert a reading unless the daily limit is used up.
+
+    Returns the number of regular readings today including the new one, or
+    None when the limit was reached and nothing was inserted. The caller is
+    expected to have reserved the reading in the quota cache.
+
+    With write-behind enabled the row is queued instead, and the reservation
+    is the only limit check; that is why write-behind is refused for workers.
+    """
+    app = get_app()
+    if app.writer is not None:
+        await app.writer.add(
+            PendingReading(
+                user_id=user.id,
+                arcana_id=card.arcana_id,
+                prediction_index=card.prediction_index,
+                variant=card.variant,
+                is_spontaneous=is_spontaneous,
+                created_at=datetime.now(timezone.utc),
+            )
+        )
+        logger.info("Queued reading for user %s with arcana %s", user.id, card.arcana_id)
+        return await _count_today_readings(session, user.id)
+
+    if limit is not None and session.get_bind().dialect.name == "postgresql":
+        # The user cache skips the upsert that used to lock this row, and the
+        # quota cache is per process: lock it here so concurrent readings of
+        # one user, in any process, take the count below one at a time.
+        await session.execute(select(User.id).where(User.id == user.id).with_for_update())
+
+    start, end = _today_bounds()
+    today = (
+        select(func.count(Reading.id).label("used"))
+        .where(Reading.user_id == user.id)
+        .where(Reading.is_spontaneous == false())
+        .where(Reading.created_at >= start)
+        .where(Reading.created_at < end)
+        .cte("today")
+        .prefix_with("MATERIALIZED")
     )
-    session.add(reading)
-    await session.commit()
+    row = select(
+        literal(user.id),
+        literal(card.arcana_id),
+        literal(card.prediction_index),
+        literal(card.variant),
+        literal(is_spontaneous),
+    ).select_from(today)
+    if limit is not None:
+        row = row.where(today.c.used < limit)
+    stmt = (
+        dialect_insert(Reading)
+        .from_select(
+            ["user_id", "arcana_id", "prediction_index", "variant", "is_spontaneous"], row
+        )
+        .returning(
+            (select(today.c.used).scalar_subquery() + int(not is_spontaneous)).label("used")
+        )
+    )
+    result = await session.execute(stmt)
+    used = result.scalar_one_or_none()
+    if used is None:
+        logger.info("User %s reached daily reading limit", user.id)
+        app.quota.set(user.id, limit, day=start.date())
+        return None
     logger.info(
         "Recorded %s reading for user %s with arcana %s",
         "spontaneous" if is_spontaneous else "regular",
         user.id,
-        arcana.name,
+        card.arcana_id,
     )
+    return int(used)
 
 
-async def _tarot_reading(user: User, gender: GenderLiteral) -> tuple[Arcana, str]:
-    arcana = choice(ARCANA)
-    prediction = get_prediction(arcana, gender)
-    logger.info("Selected arcana %s for user %s", arcana.name, user.id)
+async def _tarot_reading(user: CachedUser, gender: GenderLiteral) -> catalog.Card:
+    card = catalog.draw(gender, user.language or DEFAULT_LOCALE)
+    logger.info("Selected arcana %s for user %s", card.arcana.name, user.id)
     logger.debug(
-        "Prediction for user %s (gender=%s): %s", user.id, gender, prediction
+        "Prediction %s (variant %s) for user %s",
+        card.prediction_index,
+        card.variant,
+        user.id,
     )
-    return arcana, prediction
+    return card
 
 
 @router.message(Command("start"))
-async def cmd_start(message: types.Message) -> None:
-    async with AsyncSessionLocal() as session:
-        user, created = await _get_or_create_user(session, message.from_user)
-        logger.info("/start from user %s", message.from_user.id)
-
-        if created:
-            await _send_single_message(
-                message, MESSAGES["greeting"], reply_markup=GENDER_KEYBOARD
-            )
-            return
+async def cmd_start(message: types.Message, session: AsyncSession) -> None:
+    user, created = await _get_or_create_user(session, message.from_user)
+    await session.commit()
+    logger.info("/start from user %s", message.from_user.id)
+    texts = get_catalog(user.language)
+
+    if created:
+        await _send_single_message(
+            message, texts.messages["greeting"], reply_markup=texts.gender_keyboard
+        )
+        return
+
+    name = _display_name(user, message.from_user)
+    if user.gender in {"male", "female"}:
+        await _send_single_message(
+            message, texts.messages["welcome_back"].format(name=name)
+        )
+        await _send_reading_prompt(message, user)
+    else:
+        await _send_single_message(
+            message,
+            texts.messages["welcome_back_no_gender"].format(name=name),
+            reply_markup=texts.gender_keyboard,
+        )
 
-        name = _display_name(user, message.from_user)
-        if user.gender in {"male", "female"}:
-            await _send_single_message(
-                message, MESSAGES["welcome_back"].format(name=name)
-            )
-            await _send_reading_prompt(message)
-        else:
-            await _send_single_message(
-                message,
-                MESSAGES["welcome_back_no_gender"].format(name=name),
-                reply_markup=GENDER_KEYBOARD,
-            )
+
+@router.message(Command("stats"))
+async def cmd_stats(message: types.Message, session: AsyncSession) -> None:
+    if message.from_user is None or message.from_user.id not in get_app().settings.admin_ids:
+        return
+    report = await load_report(session, utc_today())
+    await _send_single_message(
+        message, format_report(report, resolve_locale(message.from_user.language_code))
+    )
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: types.Message) -> None:
+    if message.from_user is None or message.from_user.id not in get_app().settings.admin_ids:
+        return
+    profiler = get_app().profiler
+    path = await profiler.toggle()
+    messages = get_catalog(resolve_locale(message.from_user.language_code)).messages
+    if path is None:
+        await _send_single_message(message, messages["profile_started"])
+    else:
+        await _send_single_message(
+            message, messages["profile_saved"].format(path=path, samples=profiler.samples)
+        )
+
+
+async def _run_in_background(
+    callback: types.CallbackQuery,
+    name: str,
+    job: Callable[[AsyncSession], Awaitable[None]],
+) -> bool:
+    """Answer the callback query now and leave `job` to the callback pipeline.
+
+    Jobs of one user run in order, each with its own session. When the
+    pipeline is full the user is asked to try again instead and False is
+    returned.
+    """
+    app = get_app()
+
+    async def run() -> None:
+        async with update_session(app.sessionmaker) as session:
+            await job(session)
+
+    if app.callbacks.submit(callback.from_user.id, run, name):
+        await callback.answer()
+        return True
+    logger.warning("Callback pipeline is full, shedding %s from user %s", name, callback.from_user.id)
+    texts = get_catalog(resolve_locale(callback.from_user.language_code))
+    await callback.answer(texts.messages["busy"])
+    return False
 
 
 @router.callback_query(F.data.startswith("gender:"))
 async def set_gender(callback: types.CallbackQuery) -> None:
     gender = callback.data.split(":", maxsplit=1)[1]
     if gender not in {"male", "female"}:
-        await callback.answer(MESSAGES["unknown_choice"])
+        texts = get_catalog(resolve_locale(callback.from_user.language_code))
+        await callback.answer(texts.messages["unknown_choice"])
         return
+    await _run_in_background(
+        callback, "set_gender", lambda session: _save_gender(session, callback, gender)
+    )
 
-    async with AsyncSessionLocal() as session:
-        user, _ = await _get_or_create_user(session, callback.from_user)
-        user.gender = gender
-        await session.commit()
-        logger.info(
-            "User %s set gender to %s", callback.from_user.id, gender
-        )
-        name = _display_name(user, callback.from_user)
-        await _send_ephemeral(
-            callback.message,
-            MESSAGES["gender_saved"].format(
-                name=name, gender=GENDER_LABELS[gender]
-            ),
-        )
-        await callback.answer()
-        await _send_reading_prompt(callback.message)
+
+async def _save_gender(
+    session: AsyncSession, callback: types.CallbackQuery, gender: GenderLiteral
+) -> None:
+    user, _ = await _get_or_create_user(session, callback.from_user)
+    await session.execute(
+        update(User).where(User.id == user.id).values(gender=gender)
+    )
+    await session.commit()
+    user = get_app().users.put(replace(user, gender=gender))
+    logger.info(
+        "User %s set gender to %s", callback.from_user.id, gender
+    )
+    name = _display_name(user, callback.from_user)
+    texts = get_catalog(user.language)
+    await _send_ephemeral(
+        callback.message,
+        texts.messages["gender_saved"].format(
+            name=name, gender=texts.gender_labels[gender]
+        ),
+    )
+    await _send_reading_prompt(callback.message, user)
 
 
-async def _ensure_gender_set(message: types.Message, user: User) -> bool:
+async def _ensure_gender_set(message: types.Message, user: CachedUser) -> bool:
     if user.gender in {"male", "female"}:
         return True
     logger.info("User %s requested reading without gender", user.id)
-    await _send_ephemeral(message, MESSAGES["ask_gender"], reply_markup=GENDER_KEYBOARD)
+    texts = get_catalog(user.language)
+    await _send_ephemeral(
+        message, texts.messages["ask_gender"], reply_markup=texts.gender_keyboard
+    )
     return False
 
 
-async def _send_tarot(message: types.Message, actor: types.User | None = None) -> None:
+async def _send_tarot(
+    message: types.Message, session: AsyncSession, actor: types.User | None = None
+) -> None:
     actor = actor or message.from_user
     if actor is None:
         logger.warning("Cannot send reading without user information for message %s", message.message_id)
         return
 
-    async with AsyncSessionLocal() as session:
-        user, _ = await _get_or_create_user(session, actor)
-        logger.info("Sending reading to user %s", user.id)
-        if not await _ensure_gender_set(message, user):
-            return
-
-        used = await _count_today_readings(session, user.id)
-        if used >= 10:
-            logger.info("User %s reached daily reading limit", user.id)
-            await _send_ephemeral(message, MESSAGES["limit_reached"])
-            return
-
-        arcana, prediction = await _tarot_reading(user, user.gender)  # type: ignore[arg-type]
-        await _record_reading(session, user, arcana, prediction)
-
-        name = _display_name(user, actor)
-        intro = MESSAGES["regular_intro"].format(name=name)
-        text = (
-            f"{intro}\n\n"
-            f"{MESSAGES['arcana_label'].format(arcana=arcana.name)}\n"
-            f"{MESSAGES['arcana_meaning'].format(description=arcana.description)}\n\n"
-            f"{MESSAGES['prediction_label'].format(prediction=prediction)}"
-        )
-        await _send_single_message(message, text, reply_markup=DRAW_CARD_KEYBOARD)
+    used = None
+    app = get_app()
+    user, _ = await _get_or_create_user(session, actor)
+    logger.info("Sending reading to user %s", user.id)
+    reserved = False
+    if user.gender in {"male", "female"}:
+        await _count_today_readings(session, user.id)
+        reserved = app.quota.try_reserve(user.id, DAILY_READING_LIMIT)
+    try:
+        if reserved:
+            card = await _tarot_reading(user, user.gender)  # type: ignore[arg-type]
+            used = await _record_reading(session, user, card, limit=DAILY_READING_LIMIT)
+        await session.commit()
+    except Exception:
+        if reserved:
+            app.quota.release(user.id)
+        raise
+
+    if not await _ensure_gender_set(message, user):
+        return
+    texts = get_catalog(user.language)
+    if used is None:
+        metrics.LIMIT_REACHED.inc()
+        await _send_ephemeral(message, texts.messages["limit_reached"])
+        return
+
+    intro = texts.messages["regular_intro"].format(name=_display_name(user, actor))
+    text = _format_reading(intro, card)
+    await _send_single_message(message, text, reply_markup=texts.draw_card_keyboard)
+
+
+def _format_reading(intro: str, card: catalog.Card) -> str:
+    arcana = card.arcana
+    messages = get_catalog(card.locale).messages
+    return (
+        f"{intro}\n\n"
+        f"{messages['arcana_label'].format(arcana=arcana.name)}\n"
+        f"{messages['arcana_meaning'].format(description=arcana.description)}\n\n"
+        f"{messages['prediction_label'].format(prediction=card.prediction)}"
+    )
+
+
+async def _send_spontaneous(bot: Bot, user: CachedUser) -> catalog.Card | None:
+    if user.gender not in {"male", "female"}:
+        return None
+    card = await _tarot_reading(user, user.gender)  # type: ignore[arg-type]
+    texts = get_catalog(user.language)
+    name = user.username or texts.default_names[user.gender]
+    text = _format_reading(texts.messages["spontaneous_intro"].format(name=name), card)
+    await _replace_last_message(
+        bot,
+        user.telegram_id,
+        text,
+        reply_markup=texts.draw_card_keyboard,
+        priority=PRIORITY_BROADCAST,
+    )
+    logger.info("Sent spontaneous reading to user %s", user.id)
+    return card
 
 
 @router.callback_query(F.data == "reading")
 async def reading(callback: types.CallbackQuery) -> None:
-    logger.info("Reading request from user %s via inline button", callback.from_user.id)
-    await _send_tarot(callback.message, actor=callback.from_user)
-    await callback.answer()
+    user_id = callback.from_user.id
+    taps = get_app().taps
+    if not taps.enter(user_id):
+        logger.debug("Dropping repeated reading tap from user %s", user_id)
+        texts = get_catalog(resolve_locale(callback.from_user.language_code))
+        await callback.answer(texts.messages["reading_in_progress"])
+        return
+    logger.info("Reading request from user %s via inline button", user_id)
 
+    async def job(session: AsyncSession) -> None:
+        try:
+            await _send_tarot(callback.message, session, actor=callback.from_user)
+        finally:
+            taps.leave(user_id)
 
-async def main() -> None:
-    logger.info("Starting bot (debug=%s)", settings.debug)
-    await init_db()
+    submitted = False
+    try:
+        submitted = await _run_in_background(callback, "reading", job)
+    finally:
+        if not submitted:
+            taps.leave(user_id, debounce=False)
+
+
+def create_bot(config: Settings | None = None) -> Bot:
+    config = config or get_settings()
+    if not config.bot_token:
+        raise RuntimeError("BOT_TOKEN is required")
+    session = None
+    if config.telegram_api_url:
+        session = AiohttpSession(
+            api=TelegramAPIServer.from_base(config.telegram_api_url)
+        )
     bot = Bot(
-        token=settings.bot_token,
+        token=config.bot_token,
+        session=session,
         default=DefaultBotProperties(parse_mode="HTML"),
     )
-    await router.start_polling(bot)
+    # Outermost first: the commit before a request is not counted as Bot API time.
+    bot.session.middleware(ReleaseSessionMiddleware())
+    bot.session.middleware(BotAPIMetricsMiddleware())
+    return bot
+
+
+def create_spontaneous_scheduler(bot: Bot) -> SpontaneousScheduler:
+    app = get_app()
+    return SpontaneousScheduler(
+        app.sessionmaker,
+        lambda user: _send_spontaneous(bot, user),
+        start_hour=app.settings.daylight_start_hour,
+        end_hour=app.settings.daylight_end_hour,
+        page_size=app.settings.spontaneous_page_size,
+    )
+
+
+async def main() -> None:
+    app = create_app()
+    listener = configure_logging(app.settings)
+    try:
+        await _serve(app)
+    finally:
+        listener.stop()
+
+
+def _watch_loop(app: BotApp) -> LoopMonitor | None:
+    """Start the stall detector and let SIGUSR2 toggle the profiler."""
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(
+            signal.SIGUSR2, lambda: asyncio.ensure_future(app.profiler.toggle())
+        )
+    except (AttributeError, NotImplementedError):
+        logger.info("SIGUSR2 is not available; use /profile to toggle the profiler")
+    if app.settings.loop_stall_threshold <= 0:
+        return None
+    monitor = LoopMonitor(app.settings.loop_stall_threshold)
+    monitor.start()
+    metrics.register_collector("tarobot_loop", monitor.stats)
+    return monitor
+
+
+async def _serve(app: BotApp) -> None:
+    settings = app.settings
+    bot = create_bot(settings)
+    logger.info("Starting bot (debug=%s, mode=%s)", settings.debug, settings.bot_mode)
+    monitor = _watch_loop(app)
+    await init_db()
+    await warm_pool(min(settings.db_pool_warm, settings.db_pool_size))
+    async with app.sessionmaker() as session:
+        await app.quota.reconcile(session)
+    if isinstance(app.last_messages, DatabaseLastMessageStore):
+        app.last_messages.start()
+    if app.writer is not None:
+        await app.writer.start()
+    maintenance = ReadingMaintenance(
+        get_engine(),
+        ahead=settings.reading_partitions_ahead,
+        keep_months=settings.reading_retention_months,
+        directory=Path(settings.archive_dir),
+    )
+    maintenance.start()
+    # Runs in every worker; the high-water mark row lock serialises them.
+    rollup = ReadingRollup(app.sessionmaker, interval=settings.rollup_interval)
+    rollup.start()
+    await app.deletions.start(
+        lambda chat_id, message_id: _delete_message(bot, chat_id, message_id)
+    )
+    spontaneous = create_spontaneous_scheduler(bot)
+    # With several workers the front process sends spontaneous readings.
+    if settings.spontaneous_readings and settings.bot_mode != "worker":
+        spontaneous.start()
+    metrics_runner = None
+    if settings.metrics_port:
+        metrics_runner = await metrics.start_server(settings.metrics_host, settings.metrics_port)
+    try:
+        if settings.bot_mode in {"webhook", "worker"}:
+            await run_webhook(router, bot, settings)
+        else:
+            await bot.delete_webhook()
+            await router.start_polling(bot, close_bot_session=False)
+    finally:
+        await spontaneous.close()
+        if isinstance(app.last_messages, DatabaseLastMessageStore):
+            await app.last_messages.close()
+        await maintenance.close()
+        await rollup.close()
+        await app.callbacks.close()
+        await app.deletions.close()
+        await app.outbound.close()
+        if app.writer is not None:
+            await app.writer.close()
+        await bot.session.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        if app.profiler.running:
+            await app.profiler.toggle()
+        if monitor is not None:
+            await monitor.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+"""Compact identifiers for readings drawn from the tarot catalog.
+
+Readings store three small integers instead of text: the arcana id (its
+position in the locale's `ARCANA`), the position of the prediction in the
+arcana's list and a variant code for the locale and gender the list
+belongs to. Catalog lists are append-only so stored ids keep pointing at
+the same text.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from random import randrange
+
+from .locales import DEFAULT_LOCALE, CompiledArcana, GenderLiteral, get_catalog
+
+UNKNOWN = -1
+
+# Stable codes, never renumber: (locale, gender) of the prediction list.
+# A new locale gets its own codes here.
+VARIANTS: dict[int, tuple[str, GenderLiteral]] = {
+    1: ("ru", "male"),
+    2: ("ru", "female"),
+}
+VARIANT_CODES = {value: code for code, value in VARIANTS.items()}
+
+
+@dataclass(frozen=True)
+class Card:
+    arcana_id: int
+    prediction_index: int
+    variant: int
+
+    @property
+    def locale(self) -> str:
+        return VARIANTS[self.variant][0] if self.variant in VARIANTS else DEFAULT_LOCALE
+
+    @property
+    def arcana(self) -> CompiledArcana | None:
+        arcana = get_catalog(self.locale).arcana
+        return arcana[self.arcana_id] if 0 <= self.arcana_id < len(arcana) else None
+
+    @property
+    def prediction(self) -> str:
+        if self.arcana is None or self.variant not in VARIANTS:
+            return ""
+        locale, gender = VARIANTS[self.variant]
+        predictions = get_catalog(locale).predictions(self.arcana_id, gender)
+        if 0 <= self.prediction_index < len(predictions):
+            return predictions[self.prediction_index]
+        return ""
+
+
+def arcana_name(arcana_id: int, locale: str = DEFAULT_LOCALE) -> str:
+    arcana = get_catalog(locale).arcana
+    return arcana[arcana_id].name if 0 <= arcana_id < len(arcana) else "?"
+
+
+def draw(gender: GenderLiteral, locale: str = DEFAULT_LOCALE) -> Card:
+    if (locale, gender) not in VARIANT_CODES:
+        locale = DEFAULT_LOCALE
+    catalog = get_catalog(locale)
+    arcana_id = randrange(len(catalog.arcana))
+    predictions = catalog.predictions(arcana_id, gender)
+    return Card(arcana_id, randrange(len(predictions)), VARIANT_CODES[(locale, gender)])
+
+
+@lru_cache(maxsize=1)
+def _text_index() -> tuple[dict[str, int], dict[tuple[int, str], tuple[int, int]]]:
+    # Readings stored as text predate locales, so they are all in the default one.
+    catalog = get_catalog(DEFAULT_LOCALE)
+    names = {arcana.name: arcana_id for arcana_id, arcana in enumerate(catalog.arcana)}
+    predictions: dict[tuple[int, str], tuple[int, int]] = {}
+    for variant, (locale, gender) in VARIANTS.items():
+        if locale != DEFAULT_LOCALE:
+            continue
+        for arcana_id in range(len(catalog.arcana)):
+            for index, text in enumerate(catalog.predictions(arcana_id, gender)):
+                predictions.setdefault((arcana_id, text), (index, variant))
+    return names, predictions
+
+
+def card_for(arcana_name: str, prediction: str) -> Card:
+    """Card for a reading stored as text; unknown parts become `UNKNOWN`."""
+    names, predictions = _text_index()
+    arcana_id = names.get(arcana_name, UNKNOWN)
+    index, variant = predictions.get((arcana_id, prediction), (UNKNOWN, UNKNOWN))
+    return Card(arcana_id, index, variant)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from functools import lru_cache
 import os
 
 
@@ -9,6 +10,13 @@ def _env_int(name: str, default: int) -> int:
         return default
 
 
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
 def _env_bool(name: str, default: bool = False) -> bool:
     raw_value = os.environ.get(name)
     if raw_value is None:
@@ -23,6 +31,58 @@ class Settings:
     daylight_start_hour: int = 8
     daylight_end_hour: int = 20
     debug: bool = False
+    log_format: str = "json"
+    log_debug_rate: int = 20
+    db_echo: bool = False
+    bot_mode: str = "polling"
+    telegram_api_url: str = ""
+    webhook_url: str = ""
+    webhook_path: str = "/webhook"
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_secret: str = ""
+    max_concurrent_updates: int = 100
+    quota_cache_size: int = 100_000
+    user_cache_size: int = 50_000
+    user_cache_ttl: int = 300
+    last_message_store: str = "database"
+    last_message_cache_size: int = 100_000
+    reading_write_behind: bool = False
+    reading_batch_size: int = 500
+    reading_flush_interval: float = 1.0
+    reading_queue_size: int = 10_000
+    reading_synchronous_commit: bool = True
+    outbound_global_rate: float = 30.0
+    outbound_chat_rate: float = 1.0
+    outbound_chat_burst: int = 3
+    outbound_max_retries: int = 3
+    spontaneous_readings: bool = False
+    spontaneous_page_size: int = 200
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
+    db_pool_warm: int = 5
+    db_statement_cache_size: int = 100
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+    workers: tuple[str, ...] = ()
+    front_lanes: int = 64
+    front_queue_size: int = 1000
+    reading_partitions_ahead: int = 2
+    reading_retention_months: int = 0
+    archive_dir: str = "archive"
+    admin_ids: frozenset[int] = frozenset()
+    rollup_interval: float = 60.0
+    callback_workers: int = 16
+    callback_queue_size: int = 1000
+    tap_debounce: float = 1.0
+    tap_guard_size: int = 10_000
+    loop_stall_threshold: float = 0.1
+    slow_update_threshold: float = 1.0
+    profile_dir: str = "profiles"
+    profile_interval: float = 0.005
 
     @classmethod
     def load(cls, require_bot_token: bool = True) -> "Settings":
@@ -38,6 +98,22 @@ class Settings:
         daylight_start_hour = _env_int("DAYLIGHT_START_HOUR", 8)
         daylight_end_hour = _env_int("DAYLIGHT_END_HOUR", 20)
         debug = _env_bool("DEBUG", False)
+        log_format = os.environ.get("LOG_FORMAT", "json").lower()
+        if log_format not in {"json", "text"}:
+            raise RuntimeError(f"Unknown LOG_FORMAT: {log_format}")
+        bot_mode = os.environ.get("BOT_MODE", "polling").lower()
+        if bot_mode not in {"polling", "webhook", "worker"}:
+            raise RuntimeError(f"Unknown BOT_MODE: {bot_mode}")
+        db_pool_size = _env_int("DB_POOL_SIZE", 5)
+        last_message_store = os.environ.get("LAST_MESSAGE_STORE", "database").lower()
+        if last_message_store not in {"memory", "database"}:
+            raise RuntimeError(f"Unknown LAST_MESSAGE_STORE: {last_message_store}")
+        if bot_mode == "worker" and last_message_store == "memory":
+            raise RuntimeError("BOT_MODE=worker needs LAST_MESSAGE_STORE=database")
+        reading_write_behind = _env_bool("READING_WRITE_BEHIND", False)
+        if bot_mode == "worker" and reading_write_behind:
+            # Queued rows are invisible to the daily limit check in other workers.
+            raise RuntimeError("READING_WRITE_BEHIND cannot be used with BOT_MODE=worker")
 
         return cls(
             bot_token=bot_token_value,
@@ -45,7 +121,74 @@ class Settings:
             daylight_start_hour=daylight_start_hour,
             daylight_end_hour=daylight_end_hour,
             debug=debug,
+            log_format=log_format,
+            log_debug_rate=_env_int("LOG_DEBUG_RATE", 20),
+            db_echo=_env_bool("DB_ECHO", False),
+            bot_mode=bot_mode,
+            telegram_api_url=os.environ.get("TELEGRAM_API_URL", ""),
+            webhook_url=os.environ.get("WEBHOOK_URL", ""),
+            webhook_path=os.environ.get("WEBHOOK_PATH", "/webhook"),
+            webhook_host=os.environ.get("WEBHOOK_HOST", "0.0.0.0"),
+            webhook_port=_env_int("WEBHOOK_PORT", 8080),
+            webhook_secret=os.environ.get("WEBHOOK_SECRET", ""),
+            max_concurrent_updates=_env_int("MAX_CONCURRENT_UPDATES", 100),
+            quota_cache_size=_env_int("QUOTA_CACHE_SIZE", 100_000),
+            user_cache_size=_env_int("USER_CACHE_SIZE", 50_000),
+            user_cache_ttl=_env_int("USER_CACHE_TTL", 300),
+            last_message_store=last_message_store,
+            last_message_cache_size=_env_int("LAST_MESSAGE_CACHE_SIZE", 100_000),
+            reading_write_behind=reading_write_behind,
+            reading_batch_size=_env_int("READING_BATCH_SIZE", 500),
+            reading_flush_interval=_env_float("READING_FLUSH_INTERVAL", 1.0),
+            reading_queue_size=_env_int("READING_QUEUE_SIZE", 10_000),
+            reading_synchronous_commit=_env_bool("READING_SYNCHRONOUS_COMMIT", True),
+            outbound_global_rate=_env_float("OUTBOUND_GLOBAL_RATE", 30.0),
+            outbound_chat_rate=_env_float("OUTBOUND_CHAT_RATE", 1.0),
+            outbound_chat_burst=_env_int("OUTBOUND_CHAT_BURST", 3),
+            outbound_max_retries=_env_int("OUTBOUND_MAX_RETRIES", 3),
+            spontaneous_readings=_env_bool("SPONTANEOUS_READINGS", False),
+            spontaneous_page_size=_env_int("SPONTANEOUS_PAGE_SIZE", 200),
+            db_pool_size=db_pool_size,
+            db_max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+            db_pool_timeout=_env_float("DB_POOL_TIMEOUT", 30.0),
+            db_pool_recycle=_env_int("DB_POOL_RECYCLE", 1800),
+            db_pool_pre_ping=_env_bool("DB_POOL_PRE_PING", False),
+            db_pool_warm=_env_int("DB_POOL_WARM", db_pool_size),
+            db_statement_cache_size=_env_int("DB_STATEMENT_CACHE_SIZE", 100),
+            metrics_host=os.environ.get("METRICS_HOST", "127.0.0.1"),
+            metrics_port=_env_int("METRICS_PORT", 0),
+            workers=tuple(
+                worker.strip()
+                for worker in os.environ.get("WORKERS", "").split(",")
+                if worker.strip()
+            ),
+            front_lanes=_env_int("FRONT_LANES", 64),
+            front_queue_size=_env_int("FRONT_QUEUE_SIZE", 1000),
+            reading_partitions_ahead=_env_int("READING_PARTITIONS_AHEAD", 2),
+            reading_retention_months=_env_int("READING_RETENTION_MONTHS", 0),
+            archive_dir=os.environ.get("ARCHIVE_DIR", "archive"),
+            admin_ids=frozenset(
+                int(admin_id)
+                for admin_id in os.environ.get("ADMIN_IDS", "").split(",")
+                if admin_id.strip()
+            ),
+            rollup_interval=_env_float("ROLLUP_INTERVAL", 60.0),
+            callback_workers=_env_int("CALLBACK_WORKERS", 16),
+            callback_queue_size=_env_int("CALLBACK_QUEUE_SIZE", 1000),
+            tap_debounce=_env_float("TAP_DEBOUNCE", 1.0),
+            tap_guard_size=_env_int("TAP_GUARD_SIZE", 10_000),
+            loop_stall_threshold=_env_float("LOOP_STALL_THRESHOLD", 0.1),
+            slow_update_threshold=_env_float("SLOW_UPDATE_THRESHOLD", 1.0),
+            profile_dir=os.environ.get("PROFILE_DIR", "profiles"),
+            profile_interval=_env_float("PROFILE_INTERVAL", 0.005),
         )
 
 
-settings = Settings.load()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Settings from the environment, loaded on first use.
+
+    `BOT_TOKEN` is not required here, so tools that only need the database
+    can use the same settings; `create_bot` checks it.
+    """
+    return Settings.load(require_bot_token=False)
@@ -1,23 +1,170 @@
+import asyncio
 import logging
+import time
+from dataclasses import dataclass
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import exc, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from .config import Settings
+from .config import Settings, get_settings
+from .metrics import instrument_engine
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    checkout_wait_total: float = 0.0
+    checkout_wait_max: float = 0.0
+    overflow_events: int = 0
+    timeouts: int = 0
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records checkout wait time and overflow usage."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        overflow = self.overflow()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        pool_metrics.checkouts += 1
+        pool_metrics.checkout_wait_total += waited
+        pool_metrics.checkout_wait_max = max(pool_metrics.checkout_wait_max, waited)
+        if self.overflow() > overflow:
+            pool_metrics.overflow_events += 1
+            logger.debug("Opened overflow connection (%s in use)", self.checkedout())
+        return connection
+
+
+def _engine_options(db_settings: Settings) -> dict:
+    url = make_url(db_settings.database_url)
+    # DB_ECHO is applied to the sqlalchemy.engine logger by `logs.configure_logging`;
+    # `echo=True` would add a handler writing straight to stdout from the event loop.
+    options: dict = {"future": True}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=InstrumentedPool,
+        pool_size=db_settings.db_pool_size,
+        max_overflow=db_settings.db_max_overflow,
+        pool_timeout=db_settings.db_pool_timeout,
+        pool_recycle=db_settings.db_pool_recycle,
+        pool_pre_ping=db_settings.db_pool_pre_ping,
+    )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "prepared_statement_cache_size": db_settings.db_statement_cache_size
+        }
+    return options
+
+
 Base = declarative_base()
-db_settings = Settings.load(require_bot_token=False)
-engine = create_async_engine(
-    db_settings.database_url, echo=db_settings.debug, future=True
-)
-AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+_engine: AsyncEngine | None = None
+_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+
+
+def get_engine() -> AsyncEngine:
+    """Engine for `DATABASE_URL`, created on first use."""
+    global _engine
+    if _engine is None:
+        db_settings = get_settings()
+        _engine = create_async_engine(db_settings.database_url, **_engine_options(db_settings))
+        instrument_engine(_engine.sync_engine)
+    return _engine
+
+
+def get_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    global _sessionmaker
+    if _sessionmaker is None:
+        _sessionmaker = async_sessionmaker(
+            get_engine(), expire_on_commit=False, class_=AsyncSession
+        )
+    return _sessionmaker
+
+
+def dialect_insert(model):
+    """Build an INSERT supporting `ON CONFLICT` for the configured backend."""
+    if get_engine().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+def pool_stats() -> dict[str, float]:
+    pool = get_engine().sync_engine.pool
+    stats: dict[str, float] = {
+        "checkouts": pool_metrics.checkouts,
+        "checkout_wait_avg_seconds": (
+            pool_metrics.checkout_wait_total / pool_metrics.checkouts
+            if pool_metrics.checkouts
+            else 0.0
+        ),
+        "checkout_wait_max_seconds": pool_metrics.checkout_wait_max,
+        "overflow_events": pool_metrics.overflow_events,
+        "timeouts": pool_metrics.timeouts,
+    }
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(size=pool.size(), in_use=pool.checkedout(), overflow=pool.overflow())
+    return stats
+
+
+async def warm_pool(connections: int) -> None:
+    """Open pool connections ahead of the first burst of updates."""
+    if connections <= 0:
+        return
+
+    engine = get_engine()
+
+    async def touch():
+        conn = await engine.connect()
+        try:
+            await conn.execute(text("SELECT 1"))
+        except BaseException:
+            await conn.close()
+            raise
+        return conn
+
+    started = time.perf_counter()
+    # Check every connection out at once so they open in parallel, and keep
+    # them all checked out until the end so the pool does not reuse one.
+    results = await asyncio.gather(*(touch() for _ in range(connections)), return_exceptions=True)
+    for result in results:
+        if not isinstance(result, BaseException):
+            await result.close()
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    logger.info(
+        "Warmed %s database connections in %.0f ms",
+        connections,
+        (time.perf_counter() - started) * 1000,
+    )
 
 
 async def init_db() -> None:
+    from .migrations import apply_migrations, lock_schema
+
     logger.info("Ensuring database schema is up to date")
-    async with engine.begin() as conn:
+    async with get_engine().begin() as conn:
+        await conn.run_sync(lock_schema)
         await conn.run_sync(Base.metadata.create_all)
-    logger.info("Database schema ensured")
+        applied = await conn.run_sync(apply_migrations)
+    logger.info("Database schema ensured (applied migrations: %s)", applied or "none")
@@ -0,0 +1,206 @@
+"""Runtime diagnostics: event-loop stalls, an on-demand profiler and slow updates.
+
+`LoopMonitor` runs a timer on the event loop and a watchdog thread next to
+it. The timer measures how late the loop wakes it up; while the loop is
+stuck the watchdog samples the loop thread's stack, so the stall is logged
+with the code that blocked it.
+
+`SamplingProfiler` samples the loop thread's stack every few milliseconds
+while it runs and writes the result as collapsed stacks, one
+`frame;frame;... count` line per distinct stack, which flamegraph.pl and
+speedscope read. It is toggled with SIGUSR2 or the admin `/profile` command.
+
+`report_update` logs updates slower than SLOW_UPDATE_THRESHOLD with the time
+they spent in the database, in Bot API requests and in everything else
+(Python code, and waiting for the loop or for rate limits).
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+
+from .metrics import LOOP_LAG_SECONDS, LOOP_STALLS, SLOW_UPDATES, UpdateCost
+
+logger = logging.getLogger(__name__)
+
+_slow_update_threshold = 0.0
+
+
+def set_slow_update_threshold(seconds: float) -> None:
+    global _slow_update_threshold
+    _slow_update_threshold = seconds
+
+
+def report_update(name: str, cost: UpdateCost, elapsed: float) -> None:
+    """Log where the time went if the update took longer than the threshold."""
+    if _slow_update_threshold <= 0 or elapsed < _slow_update_threshold:
+        return
+    SLOW_UPDATES.inc(handler=name)
+    other = max(0.0, elapsed - cost.db_seconds - cost.api_seconds)
+    logger.warning(
+        "Slow update in %s: %.0fms; db %.0fms in %s queries, bot api %.0fms in %s calls, "
+        "other %.0fms",
+        name,
+        elapsed * 1000,
+        cost.db_seconds * 1000,
+        cost.queries,
+        cost.api_seconds * 1000,
+        cost.api_calls,
+        other * 1000,
+    )
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    path = "/".join(Path(code.co_filename).parts[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def collapse(frame: FrameType) -> str:
+    """The stack ending in `frame` as `outermost;...;innermost`."""
+    labels = []
+    current: FrameType | None = frame
+    while current is not None:
+        labels.append(_frame_label(current))
+        current = current.f_back
+    return ";".join(reversed(labels))
+
+
+class LoopMonitor:
+    """Records event-loop lag and logs stalls with stack samples."""
+
+    def __init__(self, threshold: float = 0.1, max_samples: int = 5) -> None:
+        self.threshold = threshold
+        self.interval = threshold / 2
+        self.max_samples = max_samples
+        self.stalls = 0
+        self.worst = 0.0
+        self._beat = time.monotonic()
+        self._samples: list[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._loop_thread = 0
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+
+    def stats(self) -> dict[str, float]:
+        return {"stalls": self.stalls, "worst_stall_seconds": self.worst}
+
+    def start(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._tick())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    async def _tick(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._beat - self.interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            if lag >= self.threshold:
+                self._report(lag)
+
+    def _report(self, lag: float) -> None:
+        with self._lock:
+            samples, self._samples = self._samples, []
+        self.stalls += 1
+        self.worst = max(self.worst, lag)
+        LOOP_STALLS.inc()
+        if not samples:
+            logger.warning("Event loop stalled for %.0fms", lag * 1000)
+            return
+        stack, seen = Counter(samples).most_common(1)[0]
+        logger.warning(
+            "Event loop stalled for %.0fms; %s of %s stack samples in:\n%s",
+            lag * 1000,
+            seen,
+            len(samples),
+            stack.rstrip(),
+        )
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            if time.monotonic() - self._beat < self.interval + self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            with self._lock:
+                if len(self._samples) < self.max_samples:
+                    self._samples.append(stack)
+
+    async def close(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+
+
+class SamplingProfiler:
+    """Samples the event-loop thread's stack while running; toggled at runtime."""
+
+    def __init__(self, directory: Path, interval: float = 0.005) -> None:
+        self.directory = directory
+        self.interval = interval
+        self.samples = 0
+        self._counts: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._target = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._target = threading.get_ident()
+        self._counts = Counter()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                self._counts[collapse(frame)] += 1
+                self.samples += 1
+
+    def stop(self) -> Path | None:
+        """Stop sampling and write the collapsed stacks; returns the file written."""
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"profile-{datetime.now():%Y%m%d-%H%M%S}.folded"
+        with path.open("w", encoding="utf-8") as output:
+            for stack, count in self._counts.most_common():
+                output.write(f"{stack} {count}\n")
+        return path
+
+    async def toggle(self) -> Path | None:
+        """Start the profiler, or stop it and return the profile it wrote."""
+        if not self.running:
+            self.start()
+            logger.info("Profiler started, sampling every %.1fms", self.interval * 1000)
+            return None
+        path = await asyncio.to_thread(self.stop)
+        logger.info("Profiler stopped, %s samples written to %s", self.samples, path)
+        return path
@@ -0,0 +1,289 @@
+"""Front process that spreads updates over bot workers by chat id.
+
+The front receives updates from Telegram (long polling or webhook) and
+forwards the raw JSON to the worker that owns the chat. Workers run
+`app.bot` with `BOT_MODE=worker`. Ownership comes from a consistent hash
+ring, so a chat always lands on the same worker and scaling the workers
+only moves a small share of chats. Updates of one chat are forwarded one at
+a time from the same lane, so they reach the worker in order.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import socket
+from typing import Any, Iterable
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, web
+
+from .config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = "https://api.telegram.org"
+RESOLVE_INTERVAL = 30
+MAX_FORWARD_ATTEMPTS = 5
+# Same header as `app.webhook`, kept here so the front does not load aiogram.
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes."""
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 100) -> None:
+        self.nodes = tuple(sorted(set(nodes)))
+        points = sorted(
+            (_hash(f"{node}#{index}"), node) for node in self.nodes for index in range(replicas)
+        )
+        self._keys = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node(self, key: int) -> str:
+        if not self._keys:
+            raise LookupError("No workers available")
+        index = bisect.bisect(self._keys, _hash(str(key))) % len(self._keys)
+        return self._owners[index]
+
+
+def update_chat_id(update: dict[str, Any]) -> int:
+    """Chat the update belongs to; the sender or update id when there is none."""
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        message = value.get("message") if key == "callback_query" else value
+        if isinstance(message, dict) and isinstance(message.get("chat"), dict):
+            return message["chat"]["id"]
+        if isinstance(value.get("chat"), dict):
+            return value["chat"]["id"]
+        if isinstance(value.get("from"), dict):
+            return value["from"]["id"]
+    return update["update_id"]
+
+
+async def _resolve(worker: str) -> list[str]:
+    """Expand `host:port` to one address per host, e.g. every scaled replica."""
+    host, _, port = worker.rpartition(":")
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, int(port), type=socket.SOCK_STREAM)
+    return sorted({f"{info[4][0]}:{port}" for info in infos})
+
+
+class Front:
+    def __init__(
+        self,
+        workers: tuple[str, ...],
+        *,
+        path: str,
+        secret_token: str = "",
+        lanes: int = 64,
+        queue_size: int = 1000,
+    ) -> None:
+        if not workers:
+            raise RuntimeError("WORKERS is required for the front process")
+        self.workers = workers
+        self.path = path
+        self.secret_token = secret_token
+        self.ring = HashRing(())
+        self.forwarded = 0
+        self.dropped = 0
+        self._lanes = [asyncio.Queue(maxsize=queue_size) for _ in range(max(1, lanes))]
+        self._tasks: list[asyncio.Task] = []
+        self._session: ClientSession | None = None
+
+    async def start(self) -> None:
+        self._session = ClientSession(timeout=ClientTimeout(total=30))
+        await self.refresh()
+        self._tasks = [asyncio.create_task(self._lane(queue)) for queue in self._lanes]
+        self._tasks.append(asyncio.create_task(self._refresh_loop()))
+
+    async def refresh(self) -> None:
+        nodes: list[str] = []
+        for worker in self.workers:
+            try:
+                nodes.extend(await _resolve(worker))
+            except OSError as exc:
+                logger.warning("Cannot resolve worker %s: %s", worker, exc)
+        if nodes and tuple(sorted(set(nodes))) != self.ring.nodes:
+            self.ring = HashRing(nodes)
+            logger.info("Forwarding updates to %s workers: %s", len(self.ring.nodes), nodes)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(RESOLVE_INTERVAL)
+            await self.refresh()
+
+    async def dispatch(self, update: dict[str, Any]) -> None:
+        """Queue the update on its chat's lane; waits while the lane is full."""
+        chat_id = update_chat_id(update)
+        await self._lanes[_hash(str(chat_id)) % len(self._lanes)].put((chat_id, update))
+
+    async def _lane(self, queue: asyncio.Queue) -> None:
+        while True:
+            chat_id, update = await queue.get()
+            try:
+                await self._forward(chat_id, update)
+            finally:
+                queue.task_done()
+
+    async def _forward(self, chat_id: int, update: dict[str, Any]) -> None:
+        assert self._session is not None
+        headers = {SECRET_TOKEN_HEADER: self.secret_token} if self.secret_token else {}
+        for attempt in range(1, MAX_FORWARD_ATTEMPTS + 1):
+            try:
+                node = self.ring.node(chat_id)
+                async with self._session.post(
+                    f"http://{node}{self.path}", json=update, headers=headers
+                ) as response:
+                    if response.status < 500:
+                        if response.status >= 400:
+                            logger.warning(
+                                "Worker %s rejected update %s with %s",
+                                node,
+                                update.get("update_id"),
+                                response.status,
+                            )
+                        self.forwarded += 1
+                        return
+            except (ClientError, LookupError, asyncio.TimeoutError) as exc:
+                logger.warning(
+                    "Forwarding update %s failed (attempt %s): %s",
+                    update.get("update_id"),
+                    attempt,
+                    exc,
+                )
+            await asyncio.sleep(min(2**attempt, 30))
+            await self.refresh()
+        self.dropped += 1
+        logger.error("Dropping update %s for chat %s", update.get("update_id"), chat_id)
+
+    async def close(self, timeout: float = 10) -> None:
+        """Forward what is already queued, then stop."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._lanes)), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Stopping with %s queued updates", sum(q.qsize() for q in self._lanes))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+
+
+class BotAPI:
+    """The few raw Bot API calls the front needs."""
+
+    def __init__(self, session: ClientSession, config: Settings) -> None:
+        self.session = session
+        base = (config.telegram_api_url or DEFAULT_API_URL).rstrip("/")
+        self.url = f"{base}/bot{config.bot_token}/"
+
+    async def call(self, method: str, **params: Any) -> Any:
+        params = {key: value for key, value in params.items() if value is not None}
+        async with self.session.post(self.url + method, json=params) as response:
+            payload = await response.json()
+        if not payload.get("ok"):
+            raise RuntimeError(f"{method} failed: {payload.get('description')}")
+        return payload["result"]
+
+
+async def poll_updates(api: BotAPI, front: Front, timeout: int = 25) -> None:
+    offset = None
+    while True:
+        try:
+            updates = await api.call("getUpdates", offset=offset, timeout=timeout)
+        except (ClientError, RuntimeError, asyncio.TimeoutError) as exc:
+            logger.warning("getUpdates failed: %s", exc)
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            await front.dispatch(update)
+            offset = update["update_id"] + 1
+
+
+async def serve_webhook(api: BotAPI, front: Front, config: Settings) -> None:
+    async def handle(request: web.Request) -> web.Response:
+        if config.webhook_secret and (
+            request.headers.get(SECRET_TOKEN_HEADER) != config.webhook_secret
+        ):
+            return web.Response(status=401)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        await front.dispatch(update)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(config.webhook_path, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, config.webhook_host, config.webhook_port).start()
+    if config.webhook_url:
+        url = config.webhook_url.rstrip("/") + config.webhook_path
+        await api.call("setWebhook", url=url, secret_token=config.webhook_secret or None)
+        logger.info("Registered webhook %s", url)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def main() -> None:
+    settings = get_settings()
+    if not settings.bot_token:
+        raise RuntimeError("BOT_TOKEN is required")
+    from .logs import configure_logging
+
+    listener = configure_logging(settings)
+    try:
+        await _serve(settings)
+    finally:
+        listener.stop()
+
+
+async def _serve(settings: Settings) -> None:
+    front = Front(
+        settings.workers,
+        path=settings.webhook_path,
+        secret_token=settings.webhook_secret,
+        lanes=settings.front_lanes,
+        queue_size=settings.front_queue_size,
+    )
+    await front.start()
+
+    spontaneous = None
+    bot = None
+    app = None
+    if settings.spontaneous_readings:
+        from .bot import create_app, create_bot, create_spontaneous_scheduler
+
+        app = create_app(settings)
+        bot = create_bot(settings)
+        spontaneous = create_spontaneous_scheduler(bot)
+        spontaneous.start()
+
+    async with ClientSession(timeout=ClientTimeout(total=60)) as session:
+        api = BotAPI(session, settings)
+        try:
+            if settings.bot_mode == "webhook":
+                await serve_webhook(api, front, settings)
+            else:
+                await api.call("deleteWebhook")
+                await poll_updates(api, front)
+        finally:
+            await front.close()
+            if spontaneous is not None:
+                await spontaneous.close()
+                await app.outbound.close()
+                await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""Locale catalogs, loaded and compiled on first use.
+
+A locale is a module in this package (`ru.py`) that defines `MESSAGES`,
+`BUTTON_TEXTS`, `GENDER_LABELS`, `DEFAULT_NAMES` and `ARCANA`. Its arcana
+must follow the same order as in the other locales, since readings store
+the position. The module is imported only when a user with that language
+needs it, and is compiled once into a `Catalog`: read-only message maps,
+predictions as tuples indexed by arcana id and gender, and the inline
+keyboards built in advance.
+"""
+
+import importlib
+import importlib.util
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Literal, Mapping, Sequence
+
+if TYPE_CHECKING:
+    from aiogram.types import InlineKeyboardMarkup
+
+GenderLiteral = Literal["male", "female"]
+
+DEFAULT_LOCALE = "ru"
+GENDERS: tuple[GenderLiteral, ...] = ("male", "female")
+
+
+@dataclass(frozen=True)
+class Arcana:
+    name: str
+    description: str
+    predictions_male: Sequence[str]
+    predictions_female: Sequence[str]
+
+
+@dataclass(frozen=True)
+class CompiledArcana:
+    name: str
+    description: str
+    # Indexed like GENDERS.
+    predictions: tuple[tuple[str, ...], ...]
+
+
+@dataclass(frozen=True)
+class Catalog:
+    code: str
+    messages: Mapping[str, str]
+    buttons: Mapping[str, str]
+    gender_labels: Mapping[str, str]
+    default_names: Mapping[str, str]
+    arcana: tuple[CompiledArcana, ...]
+    gender_keyboard: "InlineKeyboardMarkup"
+    reading_keyboard: "InlineKeyboardMarkup"
+    draw_card_keyboard: "InlineKeyboardMarkup"
+
+    def predictions(self, arcana_id: int, gender: GenderLiteral) -> tuple[str, ...]:
+        return self.arcana[arcana_id].predictions[GENDERS.index(gender)]
+
+
+def _button(text: str, data: str) -> "InlineKeyboardMarkup":
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text=text, callback_data=data)]]
+    )
+
+
+@lru_cache(maxsize=None)
+def _compile(code: str) -> Catalog:
+    # Imported here so that importing `app.catalog` does not load aiogram.
+    from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+    module = importlib.import_module(f"{__name__}.{code}")
+    buttons = MappingProxyType(dict(module.BUTTON_TEXTS))
+    return Catalog(
+        code=code,
+        messages=MappingProxyType(dict(module.MESSAGES)),
+        buttons=buttons,
+        gender_labels=MappingProxyType(dict(module.GENDER_LABELS)),
+        default_names=MappingProxyType(dict(module.DEFAULT_NAMES)),
+        arcana=tuple(
+            CompiledArcana(
+                name=arcana.name,
+                description=arcana.description,
+                predictions=(tuple(arcana.predictions_male), tuple(arcana.predictions_female)),
+            )
+            for arcana in module.ARCANA
+        ),
+        gender_keyboard=InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(text=buttons["male"], callback_data="gender:male")],
+                [InlineKeyboardButton(text=buttons["female"], callback_data="gender:female")],
+            ]
+        ),
+        reading_keyboard=_button(buttons["reading"], "reading"),
+        draw_card_keyboard=_button(buttons["draw_card"], "reading"),
+    )
+
+
+@lru_cache(maxsize=None)
+def is_available(code: str) -> bool:
+    if not code.isalpha():
+        return False
+    return importlib.util.find_spec(f"{__name__}.{code}") is not None
+
+
+def resolve_locale(language_code: str | None) -> str:
+    """Locale for a Telegram `language_code` such as `en-US`, or the default one."""
+    if language_code:
+        code = language_code.split("-", 1)[0].lower()
+        if is_available(code):
+            return code
+    return DEFAULT_LOCALE
+
+
+def get_catalog(code: str | None = None) -> Catalog:
+    if not code or not is_available(code):
+        code = DEFAULT_LOCALE
+    return _compile(code)
@@ -1,16 +1,4 @@
-from dataclasses import dataclass
-from random import choice
-from typing import Literal, Sequence
-
-GenderLiteral = Literal["male", "female"]
-
-
-@dataclass(frozen=True)
-class Arcana:
-    name: str
-    description: str
-    predictions_male: Sequence[str]
-    predictions_female: Sequence[str]
+from . import Arcana
 
 
 BUTTON_TEXTS = {
@@ -42,379 +30,381 @@ MESSAGES = {
         "С возвращением, {name}! Напомни, кто ты под звёздами, чтобы я подобрала точные слова. 🌔"
     ),
     "unknown_choice": "Туман не разобрал твой знак. Попробуй выбрать ещё раз. 🌫️",
+    "reading_in_progress": "Карта уже в пути. ✨",
+    "busy": "Карты сейчас нарасхват. Попробуй ещё раз через минуту. ⏳",
     "ask_gender": "Назови, кто ты под луной, чтобы карты нашли верные слова. 🌔",
     "gender_saved": "Записала, {name}! В хрониках отмечено: пол — {gender}. ✍️",
     "limit_reached": (
         "Колоде нужен отдых: лимит из десяти предсказаний на сегодня исчерпан. Возвращайся завтра, и звёзды вновь заговорят. 🌌"
     ),
     "regular_intro": "Твоё предсказание, {name}! ✨",
+    "spontaneous_intro": "Звёзды сами решили заговорить с тобой, {name}! 🌠",
     "arcana_label": "Карта: {arcana} 🃏",
     "arcana_meaning": "Значение: {description}",
     "prediction_label": "Послание: {prediction}",
     "reading_cta": "Жми кнопку ниже, чтобы получить свой расклад. 🧿",
+    "stats_header": "📊 Статистика на {day} (обновлено {updated})",
+    "stats_day": "{day}: раскладов {readings}, спонтанных {spontaneous}, активных {active}",
+    "stats_top_arcana": "Популярные карты сегодня: {items}",
+    "stats_genders": "По полу сегодня: {items}",
+    "stats_empty": "Статистика пока не собрана.",
+    "profile_started": "Профилировщик запущен. Повтори /profile, чтобы остановить.",
+    "profile_saved": "Профиль сохранён: {path} ({samples} сэмплов).",
 }
 
 
-ARCANA: list[Arcana] = [
+ARCANA: tuple[Arcana, ...] = (
     Arcana(
         name="Шут",  # The Fool
         description="Детский восторг, прыжок в неизвестность и ветер перемен за спиной. 🌬️",
-        predictions_male=[
+        predictions_male=(
             "Судьба приоткроет скрытую дверь — хватай шанс, пока колокол свободы звонит. 🔔",
             "Смелый шаг в сторону хаоса приведёт к встрече с союзником из сказок. 🧝",
             "Рискни спросить у ветра совет — интуиция подскажет яркую дорожку. 🌪️",
             "Играй, как будто весь мир — сцена, и новое увлечение станет началом легенды. 🎭",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Лёгкий бриз перемен принесёт искорку радости и неожиданные знакомые лица. 🍃",
             "Позволь себе волшебный эксперимент — тайный талант вспыхнет, словно фейерверк. 🎇",
             "Смотри на привычное как на загадку — ответ всплывёт, как луна из облаков. 🌙",
             "Улыбка станет ключом, что открывает дверь в запретный сад возможностей. 🗝️",
-        ],
+        ),
     ),
     Arcana(
         name="Маг",  # The Magician
         description="Сила намерения, искра творца и власть над стихиями. ✨",
-        predictions_male=[
+        predictions_male=(
             "Слова и дела сольются в одно заклинание — воспользуйся этим, чтобы завершить давний обет. 🪄",
             "Ты получишь инструмент, словно из воздуха, и проект оживёт под твоей рукой. 🧿",
             "Твоя выдержка станет арканом контроля: чёткий план принесёт быстрый триумф. 🧭",
             "Разговор с хранителем дверей откроет проход туда, где раньше стояла стена. 🚪",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Твоё красноречие околдует даже упрямые сердца — нужные слова сами лягут на язык. 💫",
             "Время воплотить знания: твоя рука создаст заметный след на свитке мира. 📜",
             "Уверенность вспыхнет талисманом и притянет союзника, усиливающего твою идею. 🔗",
             "Сформулируй цель ясно — добавь щепотку чар, и ткань реальности сложится по-твоему. 🧶",
-        ],
+        ),
     ),
     Arcana(
         name="Верховная Жрица",  # The High Priestess
         description="Тайные книги, глубокая интуиция и тихий шёпот за занавесью. 📚",
-        predictions_male=[
+        predictions_male=(
             "Внутренний голос заговорит громче ветра — доверься ему в выборе союзников. 🌘",
             "Спрячь планы под вуаль: тишина станет твоим щитом и усилит влияние. 🛡️",
             "Остановись — и увидишь ловушку раньше, чем шагнёшь в неё. Лампа интуиции уже горит. 🪔",
             "Закрытый источник знаний даст аргумент, что перевесит чашу весов. ⚖️",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Твоя проницательность на пике — обращайся с ней бережно, как с лунным светом. 🌒",
             "Секрет, что ты носишь, спасёт подругу от ошибки, если поделишься вовремя. 🤫",
             "Наблюдай, а не действуй: ответы всплывут на поверхность сами, будто руны на воде. 🔤",
             "Тихая уверенность станет аурой, и уважение придёт без лишних слов. ✨",
-        ],
+        ),
     ),
     Arcana(
         name="Императрица",  # The Empress
         description="Плодородие идей, тёплая забота и щедрость земли. 🌿",
-        predictions_male=[
+        predictions_male=(
             "Домашние заботы обернутся оберегом, укрепляя отношения и покой. 🏡",
             "Проект, требующий терпения, начнёт давать плоды, словно сад после дождя. 🌧️🍎",
             "Поддержи близкого — его успех отзовётся эхом в твоём сердце. 🎶",
             "Наведи уют, и интуиция подскажет верный выбор в делах. 🕯️",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Твоя забота расцветит пространство и наполнит разговоры теплом. 🌺",
             "Создай себе островок комфорта — энергия вернётся щедрым водопадом. 🏝️",
             "Прояви щедрость: это станет магнитом для добрых вестей и новых семян. 📩",
             "Идея о доме или быте окажется плодотворной, как волшебное зерно. 🌾",
-        ],
+        ),
     ),
     Arcana(
         name="Император",  # The Emperor
         description="Горы ответственности, каменный порядок и сила закона. 🏰",
-        predictions_male=[
+        predictions_male=(
             "Твёрдое решение разгонит хаос задач, будто рассвет тени. 🌄",
             "Миру нужен лидер — не бойся очертить границы и установить правила. 📏",
             "Дисциплина станет мечом, который принесёт заслуженное уважение. ⚔️",
             "Обдуманный шаг в карьере укрепит твою легенду на долгие годы. 🛡️",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Чёткие границы в разговоре защитят твоё время и идеи. 🔒",
             "Озвучь условия ясно — и поддержка придёт, как стража на зов. 🧭",
             "Организованность будет ключом к признанию коллег и союзников. 🗝️",
             "Твёрдость с добротой создадут авторитет, которому доверяют. 🤝",
-        ],
+        ),
     ),
     Arcana(
         name="Иерофант",  # The Hierophant
         description="Сакральные обряды, наставничество и мудрость традиций. 🕯️",
-        predictions_male=[
+        predictions_male=(
             "Совет старшего прозвучит как благословение, уберегая от лишнего риска. 🙏",
             "Следование правилам откроет тайный проход к новым связям. 🗺️",
             "Наставнический тон принесёт плоды, если добавить каплю заботы. 🌱",
             "Учёба вернёт вдохновение в дело, которое казалось пеплом. 🧠",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Делись опытом — тебя услышат, как жрицу у алтаря. ⛪",
             "Традиция повернётся выгодой, если отнестись к ней с уважением. 🎗️",
             "Встреча с учителем напомнит о ценностях, что греют сердце. 🪶",
             "Знание правил позволит изящно обойти их ради гармонии. 🌀",
-        ],
+        ),
     ),
     Arcana(
         name="Влюблённые",  # The Lovers
         description="Танец выбора, союз сердец и музыка гармонии. 🎶",
-        predictions_male=[
+        predictions_male=(
             "Честный разговор укрепит союз сильнее любого обета. 💍",
             "Перед тобой два пути — слушай сердце, а не шум случайных теней. ❤️",
             "Поддержка партнёра даст смелость шагнуть в новую реальность. 🌈",
             "Маленький романтичный жест рассеет напряжение, как аромат ладана. 🕯️",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Внимание к мелочам покажет, кто рядом искренне, а кто лишь тень. 🪽",
             "Ласковое слово перевесит спор и вернёт тепло, словно солнечный луч. ☀️",
             "Выбор, сделанный из любви, окажется верным мостом через туман. 🌉",
             "Совместное дело укрепит чувства и создаст общий алтарь целей. 🛠️",
-        ],
+        ),
     ),
     Arcana(
         name="Колесница",  # The Chariot
         description="Стремительный марш, победа движением и воля к контролю. 🏇",
-        predictions_male=[
+        predictions_male=(
             "Чёткий маршрут приведёт к быстрой славе — не сворачивай с избранной дороги. 🗺️",
             "Упрямство станет топливом, если цель сияет впереди. 🚩",
             "Темп, заданный тобой, превратит команду в эскадру победителей. 🛡️",
             "Дорога подарит важное знакомство — держи глаза открытыми. 🚆",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Возьми вожжи уверенно — ситуация ждёт твоего лидерства. 🎡",
             "День стремителен, но ты удержишь баланс, как колесница на камнях. ⚖️",
             "Смелый шаг удивит окружающих и распахнёт новый путь. 🌀",
             "Отбрось сомнения — дорога к цели станет короче и яснее. 🔭",
-        ],
+        ),
     ),
     Arcana(
         name="Сила",  # Strength
         description="Ласковая мощь, приручённый лев и стойкость сердца. 🦁",
-        predictions_male=[
+        predictions_male=(
             "Тихая уверенность убедит сильнее, чем громкий приказ. 🪶",
             "Терпение в споре принесёт уважение даже строптивому оппоненту. 🤝",
             "Самообладание укротит хаос и позволит довести дело до финала. 🧘",
             "Близкий оценит твою поддержку, даже если не попросит вслух. 🫂",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Мягкость станет заклинанием, приручающим самую сложную ситуацию. 🪄",
             "Сохрани спокойствие — двери откроются без усилий, как будто по волшебству. 🚪",
             "Забота о себе даст силы произнести важное слово. 🫀",
             "Слушай тело: оно подскажет, как бережно настоять на своём. 🌺",
-        ],
+        ),
     ),
     Arcana(
         name="Отшельник",  # The Hermit
         description="Фонарь мудреца, тишина гор и поиск внутренней истины. 🏔️",
-        predictions_male=[
+        predictions_male=(
             "Короткая пауза наедине с собой прояснит замысел, словно свеча в пещере. 🕯️",
             "Старая запись напомнит о решении, которое уже ждёт признания. 📜",
             "Отключи шум — внутренний свет укажет тропу. 🔦",
             "Ответы подарят книги, а не разговоры сегодня. 📚",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Небольшое уединение вернёт ясность и силы, словно глоток холодной воды. 💧",
             "Внутренний диалог важнее чужих мнений — прислушайся. 🧘‍♀️",
             "Вечер с дневником или медитацией принесёт долгожданный ответ. 🌌",
             "Спокойный отказ от суеты освободит время для главного. ⏳",
-        ],
+        ),
     ),
     Arcana(
         name="Колесо Фортуны",  # Wheel of Fortune
         description="Вихрь перемен, циклы судьбы и шёпот удачи. 🎡",
-        predictions_male=[
+        predictions_male=(
             "Случайный шанс поднимет тебя выше — действуй быстро, пока колесо вращается. 🌀",
             "События ускорятся: держи руку на пульсе и сердце открытым. ❤️‍🔥",
             "Смена обстоятельств сыграет тебе на руку, если примешь её без сопротивления. 🌬️",
             "Везение улыбнётся в момент, когда ты почти сдашься. Улыбнись в ответ. 😊",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Колесо повернётся в твою сторону — отпусти старое, чтобы ухватить удачу. 🍀",
             "Неожиданное приглашение изменит планы к лучшему, как внезапная радуга. 🌈",
             "Будь гибкой: перемены подарят новые ресурсы и союзников. 🤲",
             "Улыбнись случаю — он приведёт к приятному знакомству. ✨",
-        ],
+        ),
     ),
     Arcana(
         name="Справедливость",  # Justice
         description="Равновесие клинков, честность сердца и взвешенные решения. ⚖️",
-        predictions_male=[
+        predictions_male=(
             "Чёткая аргументация решит спор без всплесков эмоций. 🗡️",
             "Подпись под документом потребует внимательного взгляда на детали. 🖋️",
             "Всё станет на свои места, если будешь безупречно честен. 🕊️",
             "Справедливое решение укрепит твой авторитет в глазах судьбы. 🌟",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Будь точной в словах — это защитит твои интересы, как прозрачный щит. 🛡️",
             "Баланс между работой и отдыхом вернёт энергию и ясность. ⚖️",
             "Выбрав честность, ты получишь ответное уважение судьбы. ✨",
             "Объективный взгляд поможет принять трудное, но верное решение. 🔍",
-        ],
+        ),
     ),
     Arcana(
         name="Повешенный",  # The Hanged Man
         description="Пауза вне времени, взгляд вверх ногами и жертва ради смысла. 🔄",
-        predictions_male=[
+        predictions_male=(
             "Смени угол зрения — и скрытый ответ засияет, как символ на потолке. 🕸️",
             "Небольшая жертва сегодня убережёт от больших потерь завтра. 🩸",
             "Отпусти то, что тормозит, и появится новая возможность, словно мост из тумана. 🌫️",
             "Пауза — не поражение, а шанс собраться с силами. 💤",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Оставь старый сценарий — новый взгляд освободит поток энергии. 🔮",
             "Небольшая уступка откроет пространство для роста, как проём в стене. 🚪",
             "Тишина и терпение распутают сложный узел, если не дёргать нить. 🧶",
             "Позволь себе зависнуть — озарение приходит в невесомости. 🌌",
-        ],
+        ),
     ),
     Arcana(
         name="Смерть",  # Death
         description="Закрытая глава, трансформация и освобождение духа. 🦋",
-        predictions_male=[
+        predictions_male=(
             "Закрой старую историю решительно — пустое место наполнится новым. 📕➡️📗",
             "Не держись за исчерпавшееся: перемены очистят тропу. 🌿",
             "Разрыв привычки принесёт прилив сил, будто холодный ветер в пылающей кузнице. 🌬️",
             "Чёткое прощание с прошлым усилит твою свободу и лёгкость. 🕊️",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Отпусти то, что утяжеляет — лёгкость придёт быстро, как рассвет. 🌅",
             "Большая перемена будет мягкой, если встретить её открытыми ладонями. 🤲",
             "Смена образа или окружения вдохнёт новую жизнь, как новая кожа у змеи. 🐍",
             "Шаг в неизвестность рассеет старые страхи, как дым под ветром. 🌫️",
-        ],
+        ),
     ),
     Arcana(
         name="Умеренность",  # Temperance
         description="Золотая середина, алхимия терпения и гармония потоков. 🪙",
-        predictions_male=[
+        predictions_male=(
             "Сдержанность в эмоциях принесёт точный результат, как вода, отмеренная каплями. 💧",
             "Дозируй нагрузки — равновесие окупится крепостью духа. ⚖️",
             "Спокойный темп даст стабильный прогресс без лишних рывков. 🐢",
             "Смешай идеи аккуратно — получится крепкий союз, словно эликсир. 🧪",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Мягкий подход раскроет лучший потенциал дела, как нежное тепло над ростком. 🌱",
             "Умение слушать сегодня ценнее быстрых решений. 👂",
             "Найди золотую середину — напряжение растворится, как соль в воде. 🌊",
             "Тихая забота о себе даст ресурс для больших шагов завтра. 🛁",
-        ],
+        ),
     ),
     Arcana(
         name="Дьявол",  # The Devil
         description="Искушающие цепи, дикая энергия желания и игры теней. 🕸️",
-        predictions_male=[
+        predictions_male=(
             "Проверь свои привязки — не каждая цепь выкована из золота. ⛓️",
             "Сильное желание может ослепить: держи голову холодной, сердце горячим. ❄️🔥",
             "Не поддайся манипуляции, даже если предложение сияет. 🪝",
             "Перенаправь страсть в творчество — и искра станет светом. 🎨",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Соблазн силён, но твоя воля ярче — вспомни цель и сломай цепи. 🗝️",
             "Красота предложения скрывает цену — рассмотри детали при свете. 🕯️",
             "Ты можешь выйти из навязанной игры, стоит лишь произнести решительное \"нет\". 🚫",
             "Преврати искушение в топливо для своего проекта, и огонь станет союзником. 🔥",
-        ],
+        ),
     ),
     Arcana(
         name="Башня",  # The Tower
         description="Вспышка молнии, крушение старого и освобождающий хаос. 🌩️",
-        predictions_male=[
+        predictions_male=(
             "Резкий поворот разрушит устаревшую конструкцию — принимай урок, пока искры летят. ⚡",
             "Правда может оглушить, но она освободит пространство для нового замысла. 📡",
             "Будь гибким: падение старых планов даст шанс построить крепче. 🧱",
             "Не сопротивляйся очевидному — скорость реакции спасёт ресурсы. 🏃",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Внезапная новость встряхнёт, но принесёт ясность, как гроза над городом. 🌧️",
             "Откажись от того, что держится на страхе — время обнулиться и вдохнуть глубже. 🌬️",
             "Разрушение иллюзий больно, зато честно и освобождающе. 🪞",
             "Позволь переменам войти — на обломках вырастет сильное новое. 🌱",
-        ],
+        ),
     ),
     Arcana(
         name="Звезда",  # The Star
         description="Дальняя цель, искры вдохновения и тихая надежда. ⭐",
-        predictions_male=[
+        predictions_male=(
             "Видение будущего прояснится, если смело помечтать под ночным небом. 🌌",
             "Поддержка придёт оттуда, где не ждал — отблагодари, и поток усилится. 🙌",
             "Вдохновение ворвётся внезапно — держи под рукой перо и свиток. ✒️",
             "Верь в далёкую цель: сегодняшний шаг важнее, чем кажется. 🛤️",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Тихая вера в себя озарит путь и привлечёт союзников, словно фонари на тропе. 🏮",
             "Искренность станет магнитом для нужных людей и тёплых чудес. 🧲",
             "Отдых под звёздами или хотя бы небом зарядит вдохновением. 🌠",
             "Мечта, которую откладывала, снова позовёт — ответь ей смело. 📣",
-        ],
+        ),
     ),
     Arcana(
         name="Луна",  # The Moon
         description="Мир теней, зеркала подсознания и тайные страхи. 🌙",
-        predictions_male=[
+        predictions_male=(
             "Сомнения тянут в сторону — ищи факты, а не отражения в воде. 💧",
             "Яркий сон подскажет, что тревожит на самом деле — запиши его. 🛌",
             "Не впитывай чужие настроения: держись реальности, как каменного берега. 🪨",
             "Разговор о чувствах развеет страхи, если быть честным до конца. 🗣️",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Интуиция сильна, но проверь её фактами, чтобы не попасть в иллюзию. 🪞",
             "Мягкий лунный свет успокоит, если позволить себе замедлиться. 🕰️",
             "Не верь слухам — спроси напрямую, и вода прояснится. 💬",
             "Творчество поможет прожить сложные эмоции, превратив их в искусство. 🎭",
-        ],
+        ),
     ),
     Arcana(
         name="Солнце",  # The Sun
         description="Ясный рассвет, чистая радость и энергия успеха. ☀️",
-        predictions_male=[
+        predictions_male=(
             "Прямое решение принесёт быстрый успех — действуй открыто и смело. 🦅",
             "Радостная новость зарядит энергией тебя и твоё окружение. 📣",
             "Свет дня подсветит сильные стороны — покажи их миру. 🌟",
             "Жест благодарности вернёт тепло в отношения, как солнце в зимний день. 🔆",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Оптимизм заразителен — делись им, и день заиграет ярче. 🌻",
             "Искренность осветит путь другим и вернётся поддержкой. 🫶",
             "Улыбка и открытость привлекут нужных людей и возможности. 😊",
             "Ощущение успеха подскажет, что идёшь верной дорогой. 🚶‍♀️",
-        ],
+        ),
     ),
     Arcana(
         name="Страшный Суд",  # Judgement
         description="Зов трубы, итог пути и искра второго шанса. 📯",
-        predictions_male=[
+        predictions_male=(
             "Возвратится давний вопрос, чтобы ты поставил финальную точку. ✒️",
             "Прими ответственность — и дверь откроется заново, как портал. 🚪",
             "Старая идея оживёт в новом облике, дай ей дыхание. 🕊️",
             "Честный разговор очистит воздух и даст новое начало. 🌬️",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Повторяющаяся тема просит внимания — заверши её красиво и спокойно. 🎨",
             "Ответь на зов прошлого, чтобы освободить место будущему. 🔔",
             "Проект, казавшийся забытым, получит второе дыхание. 🌿",
             "Смелость подвести итоги подарит лёгкость и обновление. 🫧",
-        ],
+        ),
     ),
     Arcana(
         name="Мир",  # The World
         description="Целостный круг, завершение цикла и гармония всех стихий. 🌍",
-        predictions_male=[
+        predictions_male=(
             "Ты подходишь к логическому финишу — отпразднуй результат, он заслужен. 🎉",
             "Соединение опыта даст уверенность для следующего шага. 🪢",
             "Закрывая проект, оглянись: уроки ценнее, чем кажется на первый взгляд. 📘",
             "Гармония в отношениях укрепится, если разделишь успех. 🫂",
-        ],
-        predictions_female=[
+        ),
+        predictions_female=(
             "Ты завершила важный этап — отметь это и вдохни глубже. 🌺",
             "Части пазла сложатся в ясную картину, будто мандала. 🧩",
             "Спокойствие и уверенность позволят планировать новый цикл. 🔮",
             "Раздели радость с близкими — это усилит чувство целостности. 🤍",
-        ],
+        ),
     ),
-]
-
-
-ARCANA_NAMES = [arcana.name for arcana in ARCANA]
-
+)
 
-def get_prediction(arcana: Arcana, gender: GenderLiteral) -> str:
-    if gender == "male":
-        return choice(arcana.predictions_male)
-    return choice(arcana.predictions_female)
@@ -0,0 +1,131 @@
+"""Logging that stays off the event loop.
+
+Records are put on a queue by a `QueueHandler` and written to stderr by a
+`QueueListener` thread, so a slow terminal or log collector never blocks
+update handling. Each record carries the correlation id of the update it
+belongs to (`update` in JSON output). Repeats of one debug line beyond
+`LOG_DEBUG_RATE` a second are dropped; the next line that gets through
+reports how many were skipped.
+"""
+
+import copy
+import json
+import logging
+import queue
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from .config import Settings
+from .metrics import LOG_LINES_SAMPLED
+
+# Id of the update (or background job) the current task is working on.
+correlation_id: ContextVar[str] = ContextVar("correlation_id", default="")
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+# Loggers sampled like debug lines even though they log at INFO.
+SAMPLED_LOGGERS = ("sqlalchemy.engine",)
+
+
+class CorrelationFilter(logging.Filter):
+    """Stamps records with the correlation id while still in the caller's context."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """Lets through at most `per_second` repeats of a debug line each second."""
+
+    def __init__(self, per_second: int) -> None:
+        super().__init__()
+        self.per_second = per_second
+        # (logger, message template) -> (window start, lines in window, dropped)
+        self._windows: dict[tuple[str, str], tuple[float, int, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG and not record.name.startswith(SAMPLED_LOGGERS):
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        started, lines, dropped = self._windows.get(key, (now, 0, 0))
+        if now - started >= 1:
+            started, lines = now, 0
+        if lines >= self.per_second:
+            self._windows[key] = (started, lines, dropped + 1)
+            LOG_LINES_SAMPLED.inc(logger=record.name)
+            return False
+        self._windows[key] = (started, lines + 1, 0)
+        if dropped:
+            record.sampled_out = dropped
+        if len(self._windows) > 10_000:
+            self._windows.clear()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "correlation_id", ""):
+            entry["update"] = record.correlation_id
+        if getattr(record, "sampled_out", 0):
+            entry["sampled_out"] = record.sampled_out
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self) -> None:
+        super().__init__(TEXT_FORMAT)
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        if getattr(record, "correlation_id", ""):
+            line += f" [update={record.correlation_id}]"
+        if getattr(record, "sampled_out", 0):
+            line += f" [+{record.sampled_out} similar lines dropped]"
+        return line
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments here but leave the layout to the listener's formatter.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(settings: Settings) -> QueueListener:
+    """Route all logging through a background thread; stop the returned listener on exit."""
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter() if settings.log_format == "json" else TextFormatter())
+    listener = QueueListener(queue.SimpleQueue(), output, respect_handler_level=False)
+
+    handler = _QueueHandler(listener.queue)
+    handler.addFilter(CorrelationFilter())
+    if settings.log_debug_rate > 0:
+        handler.addFilter(SampleFilter(settings.log_debug_rate))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG if settings.debug else logging.INFO)
+    # Statement logging is opt-in even in debug mode; it is the loudest logger.
+    logging.getLogger("sqlalchemy.engine").setLevel(
+        logging.INFO if settings.db_echo else logging.WARNING
+    )
+    listener.start()
+    return listener
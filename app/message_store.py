@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Protocol
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .db import dialect_insert
+from .models import LastBotMessage
+
+logger = logging.getLogger(__name__)
+
+# Telegram only lets bots delete messages younger than 48 hours.
+DELETABLE_FOR = timedelta(hours=48)
+
+
+class LastMessageStore(Protocol):
+    async def get(self, chat_id: int) -> int | None: ...
+
+    async def set(self, chat_id: int, message_id: int) -> None: ...
+
+
+class MemoryLastMessageStore:
+    """Bounded LRU of the last bot message per chat.
+
+    Messages older than `DELETABLE_FOR` are not returned, as Telegram would
+    refuse to delete them.
+    """
+
+    def __init__(self, max_entries: int = 100_000) -> None:
+        self.max_entries = max_entries
+        self._messages: OrderedDict[int, tuple[int, datetime]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    async def get(self, chat_id: int) -> int | None:
+        entry = self._messages.get(chat_id)
+        if entry is None:
+            return None
+        message_id, sent_at = entry
+        if sent_at < datetime.now(timezone.utc) - DELETABLE_FOR:
+            del self._messages[chat_id]
+            return None
+        self._messages.move_to_end(chat_id)
+        return message_id
+
+    async def set(self, chat_id: int, message_id: int, sent_at: datetime | None = None) -> None:
+        self._messages[chat_id] = (message_id, sent_at or datetime.now(timezone.utc))
+        self._messages.move_to_end(chat_id)
+        while len(self._messages) > self.max_entries:
+            self._messages.popitem(last=False)
+
+
+class DatabaseLastMessageStore:
+    """Persists the last bot message per chat in `last_bot_messages`.
+
+    The table survives restarts and can be shared by several processes. An
+    optional in-memory LRU in front of it saves the read on the hot path.
+    Once started, rows for messages that can no longer be deleted are pruned
+    every `prune_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        cache: MemoryLastMessageStore | None = None,
+        prune_interval: float = 3600,
+    ) -> None:
+        self.sessionmaker = sessionmaker
+        self.cache = cache
+        self.prune_interval = prune_interval
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.prune()
+            except Exception:  # noqa: BLE001
+                logger.exception("Pruning last-message rows failed")
+            await asyncio.sleep(self.prune_interval)
+
+    async def get(self, chat_id: int) -> int | None:
+        if self.cache is not None:
+            message_id = await self.cache.get(chat_id)
+            if message_id is not None:
+                return message_id
+
+        stmt = (
+            select(LastBotMessage.message_id, LastBotMessage.updated_at)
+            .where(LastBotMessage.chat_id == chat_id)
+            .where(LastBotMessage.updated_at >= datetime.now(timezone.utc) - DELETABLE_FOR)
+        )
+        async with self.sessionmaker() as session:
+            row = (await session.execute(stmt)).one_or_none()
+        if row is None:
+            return None
+        if self.cache is not None:
+            sent_at = row.updated_at
+            if sent_at.tzinfo is None:
+                sent_at = sent_at.replace(tzinfo=timezone.utc)
+            await self.cache.set(chat_id, row.message_id, sent_at)
+        return row.message_id
+
+    async def set(self, chat_id: int, message_id: int) -> None:
+        now = datetime.now(timezone.utc)
+        insert_stmt = dialect_insert(LastBotMessage).values(
+            chat_id=chat_id, message_id=message_id, updated_at=now
+        )
+        stmt = insert_stmt.on_conflict_do_update(
+            index_elements=[LastBotMessage.chat_id],
+            set_={"message_id": message_id, "updated_at": now},
+        )
+        async with self.sessionmaker() as session:
+            await session.execute(stmt)
+            await session.commit()
+        if self.cache is not None:
+            await self.cache.set(chat_id, message_id, now)
+
+    async def prune(self) -> int:
+        """Drop rows for messages Telegram no longer lets us delete."""
+        stmt = delete(LastBotMessage).where(
+            LastBotMessage.updated_at < datetime.now(timezone.utc) - DELETABLE_FOR
+        )
+        async with self.sessionmaker() as session:
+            result = await session.execute(stmt)
+            await session.commit()
+        logger.info("Pruned %s stale last-message rows", result.rowcount)
+        return result.rowcount
+
+
+def create_last_message_store(
+    kind: str,
+    sessionmaker: async_sessionmaker[AsyncSession],
+    cache_size: int,
+    shared: bool = False,
+) -> LastMessageStore:
+    """Store for the last bot message per chat.
+
+    A `shared` table is also written by other processes (the front sends
+    spontaneous readings to chats the workers own), so it gets no local
+    cache that could hand out an id another process has replaced.
+    """
+    cache = MemoryLastMessageStore(max_entries=cache_size)
+    if kind == "memory":
+        return cache
+    return DatabaseLastMessageStore(sessionmaker, cache=None if shared else cache)
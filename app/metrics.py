@@ -0,0 +1,293 @@
+"""In-process metrics exported in the Prometheus text format.
+
+Only the standard library and SQLAlchemy are imported here, so the
+database layer can be instrumented without loading aiogram or aiohttp.
+"""
+
+import bisect
+import logging
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50)
+QUANTILES = (0.5, 0.95, 0.99)
+
+LabelKey = tuple[str, ...]
+
+_metrics: list["Counter | Histogram"] = []
+_collectors: dict[str, Callable[[], dict[str, float]]] = {}
+
+
+def _format_labels(names: tuple[str, ...], values: LabelKey, **extra: str) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[LabelKey, float] = {}
+        _metrics.append(self)
+
+    def _key(self, labels: dict[str, str]) -> LabelKey:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self, size: int) -> None:
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are interpolated inside a bucket."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.bounds = tuple(buckets)
+        self._series: dict[LabelKey, _Series] = {}
+        _metrics.append(self)
+
+    def _key(self, labels: dict[str, str]) -> LabelKey:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(len(self.bounds) + 1)
+        series.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        series.count += 1
+        series.sum += value
+
+    def totals(self, **labels: str) -> tuple[int, float]:
+        """Observation count and sum, across all series matching `labels`."""
+        count, total = 0, 0.0
+        wanted = {self.labelnames.index(name): str(value) for name, value in labels.items()}
+        for key, series in self._series.items():
+            if all(key[index] == value for index, value in wanted.items()):
+                count += series.count
+                total += series.sum
+        return count, total
+
+    def quantile(self, q: float, **labels: str) -> float:
+        series = self._series.get(self._key(labels))
+        return self._quantile(series, q) if series is not None else 0.0
+
+    def _quantile(self, series: _Series, q: float) -> float:
+        if not series.count:
+            return 0.0
+        rank = q * series.count
+        seen = 0
+        for index, count in enumerate(series.buckets):
+            if seen + count >= rank and count:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        quantile_lines = []
+        for key, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds, series.buckets):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, le=f"{bound:g}")
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, le="+Inf")
+            lines.append(f"{self.name}_bucket{labels} {series.count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series.sum:g}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+            for q in QUANTILES:
+                labels = _format_labels(self.labelnames, key, quantile=f"{q:g}")
+                quantile_lines.append(
+                    f"{self.name}_quantile{labels} {self._quantile(series, q):g}"
+                )
+        if quantile_lines:
+            lines.append(f"# TYPE {self.name}_quantile gauge")
+            lines.extend(quantile_lines)
+        return lines
+
+
+UPDATE_SECONDS = Histogram(
+    "tarobot_update_seconds", "Time spent handling an update.", ("handler", "status")
+)
+UPDATE_DB_QUERIES = Histogram(
+    "tarobot_update_db_queries",
+    "Database queries issued while handling an update.",
+    ("handler",),
+    buckets=COUNT_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "tarobot_db_query_seconds", "Database query execution time.", ("statement",)
+)
+BOT_API_SECONDS = Histogram(
+    "tarobot_bot_api_seconds", "Bot API request time.", ("method", "status")
+)
+LIMIT_REACHED = Counter(
+    "tarobot_limit_reached_total", "Reading requests refused by the daily limit."
+)
+DELETE_FAILURES = Counter(
+    "tarobot_delete_failures_total", "Bot message deletions that failed."
+)
+CALLBACK_QUEUE_SECONDS = Histogram(
+    "tarobot_callback_queue_seconds", "Time callback jobs waited for a worker."
+)
+CALLBACK_JOB_SECONDS = Histogram(
+    "tarobot_callback_job_seconds", "Time spent running callback jobs.", ("job", "status")
+)
+TAPS_DROPPED = Counter(
+    "tarobot_taps_dropped_total",
+    "Repeated button taps dropped while a reading was in flight or just sent.",
+    ("reason",),
+)
+LOG_LINES_SAMPLED = Counter(
+    "tarobot_log_lines_sampled_total", "Repeated debug lines dropped by sampling.", ("logger",)
+)
+LOOP_LAG_SECONDS = Histogram(
+    "tarobot_loop_lag_seconds", "How late the event loop ran a periodic timer."
+)
+LOOP_STALLS = Counter(
+    "tarobot_loop_stalls_total", "Event loop stalls longer than LOOP_STALL_THRESHOLD."
+)
+SLOW_UPDATES = Counter(
+    "tarobot_slow_updates_total", "Updates slower than SLOW_UPDATE_THRESHOLD.", ("handler",)
+)
+CALLBACKS_SHED = Counter(
+    "tarobot_callbacks_shed_total", "Callback queries refused because the pipeline was full."
+)
+
+
+@dataclass
+class UpdateCost:
+    """Database and Bot API time spent on one update or callback job."""
+
+    queries: int = 0
+    db_seconds: float = 0.0
+    api_calls: int = 0
+    api_seconds: float = 0.0
+
+
+# Cost of the update being handled; set by the handler middleware.
+update_cost: ContextVar[UpdateCost | None] = ContextVar("update_cost", default=None)
+
+
+def register_collector(prefix: str, collect: Callable[[], dict[str, float]]) -> None:
+    """Export the values returned by `collect` as gauges named `prefix_<key>`."""
+    _collectors[prefix] = collect
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for prefix, collect in _collectors.items():
+        try:
+            values = collect()
+        except Exception:  # noqa: BLE001
+            logger.exception("Metrics collector %s failed", prefix)
+            continue
+        for key, value in values.items():
+            name = f"{prefix}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {float(value):g}")
+    return "\n".join(lines) + "\n"
+
+
+def _statement_kind(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every query executed through `engine`."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.observe(elapsed, statement=_statement_kind(statement))
+        cost = update_cost.get()
+        if cost is not None:
+            cost.queries += 1
+            cost.db_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context) -> None:  # noqa: ANN001
+        stack = context.connection.info.get("query_started") if context.connection else None
+        if stack:
+            stack.pop()
+
+
+async def handle_metrics(request: "web.Request") -> "web.Response":
+    from aiohttp import web
+
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_server(host: str, port: int) -> "web.AppRunner":
+    from aiohttp import web
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Serving metrics on http://%s:%s/metrics", host, port)
+    return runner
@@ -0,0 +1,158 @@
+"""Dispatcher and Bot API session middlewares."""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .diagnostics import report_update
+from .logs import correlation_id
+from .metrics import BOT_API_SECONDS, UPDATE_DB_QUERIES, UPDATE_SECONDS, UpdateCost, update_cost
+
+logger = logging.getLogger(__name__)
+
+# Session of the update being handled and the task handling it.
+_update_session: ContextVar[tuple[asyncio.Task | None, AsyncSession] | None] = ContextVar(
+    "update_session", default=None
+)
+
+
+def _handler_name(data: dict[str, Any]) -> str:
+    handler = data.get("handler")
+    callback = getattr(handler, "callback", None)
+    return getattr(callback, "__name__", "unknown")
+
+
+class CorrelationMiddleware(BaseMiddleware):
+    """Tags everything logged while handling an update with the update's id."""
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        token = correlation_id.set(str(getattr(event, "update_id", "")))
+        try:
+            return await handler(event, data)
+        finally:
+            correlation_id.reset(token)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Times each handler call, counts the queries it issued and logs slow ones."""
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        name = _handler_name(data)
+        cost = UpdateCost()
+        token = update_cost.set(cost)
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await handler(event, data)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            UPDATE_SECONDS.observe(elapsed, handler=name, status=status)
+            UPDATE_DB_QUERIES.observe(cost.queries, handler=name)
+            report_update(name, cost, elapsed)
+            update_cost.reset(token)
+
+
+class BotAPIMetricsMiddleware(BaseRequestMiddleware):
+    """Times every Bot API request made through the bot session."""
+
+    async def __call__(self, make_request, bot, method):  # type: ignore[no-untyped-def]
+        name = getattr(method, "__api_method__", type(method).__name__)
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            BOT_API_SECONDS.observe(elapsed, method=name, status=status)
+            cost = update_cost.get()
+            if cost is not None:
+                cost.api_calls += 1
+                cost.api_seconds += elapsed
+
+
+async def release_session() -> None:
+    """Commit the current update's transaction, returning its connection to the pool.
+
+    Only the task handling the update does this; tasks it spawned inherit
+    the context but must not touch a session that is still in use.
+    """
+    current = _update_session.get()
+    if current is None:
+        return
+    owner, session = current
+    if owner is asyncio.current_task() and session.in_transaction():
+        logger.debug("Releasing the update session before outbound I/O")
+        await session.commit()
+
+
+@asynccontextmanager
+async def update_session(
+    sessionmaker: Callable[[], AsyncSession],
+) -> AsyncIterator[AsyncSession]:
+    """Session for one update, owned by the current task.
+
+    Whatever is left in the transaction is committed when the block exits
+    without an error.
+    """
+    async with sessionmaker() as session:
+        token = _update_session.set((asyncio.current_task(), session))
+        try:
+            yield session
+            if session.in_transaction():
+                await session.commit()
+        finally:
+            _update_session.reset(token)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Passes handlers one `session` per update.
+
+    The session checks out a connection only when the first statement runs
+    and gives it back when the transaction ends. `release_session` ends it
+    before any request to Telegram, so a connection is never held while
+    waiting on the network.
+    """
+
+    def __init__(self, sessionmaker: Callable[[], AsyncSession]) -> None:
+        self.sessionmaker = sessionmaker
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: dict[str, Any],
+    ) -> Any:
+        async with update_session(self.sessionmaker) as session:
+            data["session"] = session
+            return await handler(event, data)
+
+
+class ReleaseSessionMiddleware(BaseRequestMiddleware):
+    """Releases the update's database connection before each Bot API request."""
+
+    async def __call__(self, make_request, bot, method):  # type: ignore[no-untyped-def]
+        await release_session()
+        return await make_request(bot, method)
@@ -0,0 +1,205 @@
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    String,
+    Table,
+    bindparam,
+    column,
+    func,
+    inspect,
+    select,
+    table,
+    text,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex, ExecutableDDLElement
+
+from .catalog import UNKNOWN, card_for
+from .db import Base
+from .models import Reading
+from .partitions import partition_readings
+
+logger = logging.getLogger(__name__)
+
+COMPACT_BATCH_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    statements: tuple[str | ExecutableDDLElement | Callable[[Connection], None], ...]
+
+
+def _index(table, name: str) -> CreateIndex:
+    index = next(index for index in table.indexes if index.name == name)
+    return CreateIndex(index, if_not_exists=True)
+
+
+def compact_readings(conn: Connection, commit_batches: bool = False) -> None:
+    """Replace the reading text columns with catalog ids.
+
+    Rows are converted in keyset-ordered batches, so memory use does not
+    depend on the table size. Text that is no longer in the catalog is
+    stored as `UNKNOWN`.
+
+    At startup this runs in the migration transaction under the advisory
+    lock, which is fine for small tables. Large ones are converted beforehand
+    by `scripts.compact_readings`, which sets `commit_batches` so each batch
+    is committed on its own and an interrupted run resumes where it stopped.
+    """
+    columns = {info["name"] for info in inspect(conn).get_columns("readings")}
+    if "arcana" not in columns:
+        return
+    for name in ("arcana_id", "prediction_index", "variant"):
+        if name not in columns:
+            conn.exec_driver_sql(f"ALTER TABLE readings ADD COLUMN {name} SMALLINT")
+
+    readings = table(
+        "readings",
+        column("id"),
+        column("arcana"),
+        column("prediction"),
+        column("arcana_id"),
+        column("prediction_index"),
+        column("variant"),
+    )
+    convert = (
+        update(readings)
+        .where(readings.c.id == bindparam("row_id"))
+        .values(
+            arcana_id=bindparam("new_arcana_id"),
+            prediction_index=bindparam("new_prediction_index"),
+            variant=bindparam("new_variant"),
+        )
+    )
+    cursor, converted, unknown = 0, 0, 0
+    while True:
+        rows = conn.execute(
+            select(readings.c.id, readings.c.arcana, readings.c.prediction)
+            .where(readings.c.id > cursor, readings.c.arcana_id.is_(None))
+            .order_by(readings.c.id)
+            .limit(COMPACT_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        cursor = rows[-1].id
+        params = []
+        for row in rows:
+            card = card_for(row.arcana, row.prediction)
+            unknown += card.prediction_index == UNKNOWN
+            params.append(
+                {
+                    "row_id": row.id,
+                    "new_arcana_id": card.arcana_id,
+                    "new_prediction_index": card.prediction_index,
+                    "new_variant": card.variant,
+                }
+            )
+        conn.execute(convert, params)
+        if commit_batches:
+            conn.commit()
+        converted += len(rows)
+        logger.info("Converted %s readings", converted)
+    if unknown:
+        logger.warning("%s readings had text that is not in the catalog", unknown)
+
+    conn.exec_driver_sql("ALTER TABLE readings DROP COLUMN prediction")
+    conn.exec_driver_sql("ALTER TABLE readings DROP COLUMN arcana")
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql(
+            "ALTER TABLE readings ALTER COLUMN arcana_id SET NOT NULL, "
+            "ALTER COLUMN prediction_index SET NOT NULL, "
+            "ALTER COLUMN variant SET NOT NULL"
+        )
+
+
+def _add_user_language(conn: Connection) -> None:
+    columns = {info["name"] for info in inspect(conn).get_columns("users")}
+    if "language" not in columns:
+        conn.exec_driver_sql("ALTER TABLE users ADD COLUMN language VARCHAR(8)")
+
+
+# Append new migrations at the end; applied versions are never re-run.
+# Version 2 was dropped (users.telegram_id is unique in the model); do not reuse it.
+MIGRATIONS: list[Migration] = [
+    Migration(
+        1,
+        "Index today's regular readings per user",
+        (_index(Reading.__table__, "ix_readings_user_created_regular"),),
+    ),
+    Migration(
+        3,
+        "Store readings as catalog ids instead of text",
+        (compact_readings,),
+    ),
+    Migration(
+        4,
+        "Partition readings by month (PostgreSQL)",
+        (partition_readings,),
+    ),
+    Migration(
+        5,
+        "Per-user interface language",
+        (_add_user_language,),
+    ),
+]
+
+schema_migrations = Table(
+    "schema_migrations",
+    Base.metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+_LOCK_KEY = zlib.crc32(b"tarobot:schema_migrations")
+
+
+def lock_schema(conn: Connection) -> None:
+    """Serialise schema changes across processes until the transaction ends.
+
+    Take it before `create_all`: concurrent `CREATE TABLE` of one name fails
+    on PostgreSQL, so processes starting together must not race there either.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+
+
+def apply_migrations(conn: Connection) -> list[int]:
+    """Apply pending migrations inside the caller's transaction.
+
+    Meant for `AsyncConnection.run_sync`. On PostgreSQL an advisory lock keeps
+    several starting processes from applying the same version twice; it is
+    reentrant, so callers that took `lock_schema` first lose nothing.
+    """
+    lock_schema(conn)
+    schema_migrations.create(conn, checkfirst=True)
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    done: list[int] = []
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        logger.info("Applying migration %s: %s", migration.version, migration.description)
+        for statement in migration.statements:
+            if isinstance(statement, str):
+                conn.exec_driver_sql(statement)
+            elif isinstance(statement, ExecutableDDLElement):
+                conn.execute(statement)
+            else:
+                statement(conn)
+        conn.execute(
+            schema_migrations.insert().values(
+                version=migration.version, description=migration.description
+            )
+        )
+        done.append(migration.version)
+    return done
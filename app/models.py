@@ -1,7 +1,20 @@
 from datetime import date, datetime
 from typing import Optional
 
-from sqlalchemy import BigInteger, Boolean, Date, DateTime, Enum, ForeignKey, Integer, String, Text, func
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Date,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    SmallInteger,
+    String,
+    false,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .db import Base
@@ -16,6 +29,7 @@ class User(Base):
     telegram_id: Mapped[int] = mapped_column(BigInteger, unique=True, nullable=False, index=True)
     username: Mapped[Optional[str]] = mapped_column(String(255))
     gender: Mapped[Optional[str]] = mapped_column(GenderEnum)
+    language: Mapped[Optional[str]] = mapped_column(String(8))
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
@@ -31,9 +45,76 @@ class Reading(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
-    arcana: Mapped[str] = mapped_column(String(100), nullable=False)
-    prediction: Mapped[str] = mapped_column(Text, nullable=False)
+    # Catalog ids, see app.catalog.Card for resolving them to text.
+    arcana_id: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    prediction_index: Mapped[int] = mapped_column(SmallInteger, nullable=False)
+    variant: Mapped[int] = mapped_column(SmallInteger, nullable=False)
     is_spontaneous: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false")
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # On PostgreSQL the table is partitioned by month on created_at, see app.partitions.
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
 
     user: Mapped[User] = relationship(back_populates="readings")
+
+    __table_args__ = (
+        Index(
+            "ix_readings_user_created_regular",
+            "user_id",
+            "created_at",
+            postgresql_where=is_spontaneous == false(),
+            sqlite_where=is_spontaneous == false(),
+        ),
+    )
+
+
+class LastBotMessage(Base):
+    __tablename__ = "last_bot_messages"
+
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class ScheduledDeletion(Base):
+    __tablename__ = "scheduled_deletions"
+
+    chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    message_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    due_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class ReadingDailyStat(Base):
+    """Readings per UTC day, arcana and variant, maintained by app.rollups."""
+
+    __tablename__ = "reading_daily_stats"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    arcana_id: Mapped[int] = mapped_column(SmallInteger, primary_key=True, autoincrement=False)
+    variant: Mapped[int] = mapped_column(SmallInteger, primary_key=True, autoincrement=False)
+    readings: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    spontaneous: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class DailyTotal(Base):
+    __tablename__ = "daily_totals"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    readings: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    spontaneous: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    active_users: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class DailyActiveUser(Base):
+    __tablename__ = "daily_active_users"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+
+
+class RollupState(Base):
+    __tablename__ = "rollup_state"
+
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    last_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
@@ -0,0 +1,391 @@
+"""Monthly partitions of `readings` and the retention job that archives them.
+
+On PostgreSQL `readings` is range-partitioned by `created_at`, one partition
+per UTC month (`readings_2024_05`), plus a default partition that only
+catches rows outside the prepared months; they move to their month's
+partition when it is created. Old months are detached, streamed to
+gzip-compressed CSV files and dropped, and old rows left in the default
+partition are streamed out and deleted. SQLite has no partitions, so there
+the retention job streams and deletes old rows instead.
+"""
+
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import re
+import zlib
+from datetime import date, datetime, time, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+PARENT = "readings"
+DEFAULT_PARTITION = "readings_default"
+COLUMNS = (
+    "id",
+    "user_id",
+    "arcana_id",
+    "prediction_index",
+    "variant",
+    "is_spontaneous",
+    "created_at",
+)
+ARCHIVE_CHUNK = 5000
+
+_PARTITION_RE = re.compile(r"^readings_(\d{4})_(\d{2})$")
+_LOCK_KEY = zlib.crc32(b"tarobot:reading_partitions")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_{month:%Y_%m}"
+
+
+def _bound(month: date) -> str:
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = :name AND pg_table_is_visible(c.oid)"
+            ),
+            {"name": PARENT},
+        ).scalar()
+    )
+
+
+def _exists(conn: Connection, name: str) -> bool:
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+
+def create_partition(conn: Connection, month: date) -> None:
+    """Create the month's partition, moving its rows out of the default partition.
+
+    PostgreSQL refuses a partition whose range already has rows in the
+    default, which happens after downtime longer than the months prepared
+    ahead, so such rows are moved while the default is detached.
+    """
+    name = partition_name(month)
+    if _exists(conn, name):
+        return
+    start, end = _bound(month), _bound(add_months(month, 1))
+    create = f"CREATE TABLE {name} PARTITION OF {PARENT} FOR VALUES FROM ({start}) TO ({end})"
+    in_month = f"created_at >= {start} AND created_at < {end}"
+    if not _exists(conn, DEFAULT_PARTITION) or not conn.exec_driver_sql(
+        f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month} LIMIT 1"
+    ).scalar():
+        conn.exec_driver_sql(create)
+        return
+
+    columns = ", ".join(COLUMNS)
+    conn.exec_driver_sql(f"ALTER TABLE {PARENT} DETACH PARTITION {DEFAULT_PARTITION}")
+    conn.exec_driver_sql(create)
+    conn.exec_driver_sql(
+        f"INSERT INTO {name} ({columns}) "
+        f"SELECT {columns} FROM {DEFAULT_PARTITION} WHERE {in_month}"
+    )
+    moved = conn.exec_driver_sql(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}").rowcount
+    conn.exec_driver_sql(f"ALTER TABLE {PARENT} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT")
+    logger.info("Moved %s readings from %s to %s", moved, DEFAULT_PARTITION, name)
+
+
+def ensure_partitions(conn: Connection, ahead: int = 2, today: date | None = None) -> None:
+    """Create partitions for the current month and `ahead` following ones."""
+    if not is_partitioned(conn):
+        return
+    current = month_start(today or datetime.now(timezone.utc).date())
+    for offset in range(ahead + 1):
+        create_partition(conn, add_months(current, offset))
+    conn.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"
+    )
+
+
+def partition_readings(conn: Connection, ahead: int = 2) -> None:
+    """Turn a plain `readings` table into a partitioned one, keeping its rows."""
+    if conn.dialect.name != "postgresql" or is_partitioned(conn):
+        return
+    legacy = f"{PARENT}_unpartitioned"
+    conn.exec_driver_sql(f"ALTER TABLE {PARENT} RENAME TO {legacy}")
+    conn.exec_driver_sql(f"ALTER INDEX IF EXISTS {PARENT}_pkey RENAME TO {legacy}_pkey")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_readings_user_created_regular")
+    conn.exec_driver_sql(f"ALTER SEQUENCE {PARENT}_id_seq OWNED BY NONE")
+    conn.exec_driver_sql(
+        f"""
+        CREATE TABLE {PARENT} (
+            id INTEGER NOT NULL DEFAULT nextval('{PARENT}_id_seq'),
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            arcana_id SMALLINT NOT NULL,
+            prediction_index SMALLINT NOT NULL,
+            variant SMALLINT NOT NULL,
+            is_spontaneous BOOLEAN DEFAULT false,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    conn.exec_driver_sql(
+        f"CREATE INDEX ix_readings_user_created_regular ON {PARENT} (user_id, created_at) "
+        "WHERE is_spontaneous = false"
+    )
+
+    first = conn.exec_driver_sql(f"SELECT min(created_at) FROM {legacy}").scalar()
+    current = month_start(datetime.now(timezone.utc).date())
+    month = month_start(first.astimezone(timezone.utc).date()) if first else current
+    while month < current:
+        create_partition(conn, month)
+        month = add_months(month, 1)
+    ensure_partitions(conn, ahead)
+
+    columns = ", ".join(COLUMNS)
+    conn.exec_driver_sql(
+        f"INSERT INTO {PARENT} ({columns}) "
+        f"SELECT {columns.replace('created_at', 'coalesce(created_at, now())')} FROM {legacy}"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {legacy}")
+    conn.exec_driver_sql(f"ALTER SEQUENCE {PARENT}_id_seq OWNED BY {PARENT}.id")
+
+
+def _month_partitions(conn: Connection) -> dict[str, tuple[date, bool]]:
+    """Month partitions by name, with their month and whether they are attached."""
+    rows = conn.execute(
+        text(
+            "SELECT c.relname, i.inhparent IS NOT NULL FROM pg_class c "
+            "LEFT JOIN pg_inherits i ON i.inhrelid = c.oid "
+            "WHERE c.relkind = 'r' AND c.relname LIKE :pattern AND pg_table_is_visible(c.oid)"
+        ),
+        {"pattern": f"{PARENT}\\_%"},
+    ).all()
+    partitions = {}
+    for name, attached in rows:
+        match = _PARTITION_RE.match(name)
+        if match:
+            partitions[name] = (date(int(match[1]), int(match[2]), 1), attached)
+    return partitions
+
+
+class ArchiveFile:
+    """Gzip CSV written under a temporary name and renamed once complete."""
+
+    def __init__(
+        self, path: Path, compresslevel: int = 9, columns: tuple[str, ...] = COLUMNS
+    ) -> None:
+        self.path = path
+        self._partial = path.with_name(path.name + ".partial")
+        self._file = gzip.open(
+            self._partial, "wt", compresslevel=compresslevel, newline="", encoding="utf-8"
+        )
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+        self.rows = 0
+
+    async def write(self, rows: list) -> None:
+        await asyncio.to_thread(self._writer.writerows, rows)
+        self.rows += len(rows)
+
+    async def finish(self) -> None:
+        def close() -> None:
+            self._file.close()
+            with open(self._partial, "rb") as stored:
+                os.fsync(stored.fileno())
+            self._partial.replace(self.path)
+
+        await asyncio.to_thread(close)
+        logger.info("Wrote %s rows to %s", self.rows, self.path)
+
+
+def _archive_path(directory: Path, table: str, month: date) -> Path:
+    """`<table>_YYYY_MM.csv.gz`, numbered if an earlier run already wrote one."""
+    path = directory / f"{table}_{month:%Y_%m}.csv.gz"
+    number = 1
+    while path.exists():
+        number += 1
+        path = directory / f"{table}_{month:%Y_%m}-{number}.csv.gz"
+    return path
+
+
+async def archive_readings(
+    engine: AsyncEngine, *, keep_months: int, directory: Path, today: date | None = None
+) -> list[Path]:
+    """Move readings older than `keep_months` full months to compressed files."""
+    cutoff = add_months(month_start(today or datetime.now(timezone.utc).date()), -keep_months)
+    directory.mkdir(parents=True, exist_ok=True)
+    if engine.dialect.name == "postgresql":
+        return await _archive_partitions(engine, cutoff, directory)
+    return await _archive_rows(engine, cutoff, directory)
+
+
+async def _archive_partitions(engine: AsyncEngine, cutoff: date, directory: Path) -> list[Path]:
+    async with engine.connect() as conn:
+        partitions = await conn.run_sync(_month_partitions)
+    archived = []
+    for name, (month, attached) in sorted(partitions.items()):
+        if month >= cutoff:
+            continue
+        if attached:
+            async with engine.begin() as conn:
+                await conn.exec_driver_sql(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+            logger.info("Detached partition %s", name)
+
+        archive = ArchiveFile(_archive_path(directory, PARENT, month))
+        async with engine.connect() as conn:
+            result = await conn.stream(
+                text(f"SELECT {', '.join(COLUMNS)} FROM {name} ORDER BY id"),
+                execution_options={"yield_per": ARCHIVE_CHUNK},
+            )
+            async for chunk in result.partitions(ARCHIVE_CHUNK):
+                await archive.write(chunk)
+        await archive.finish()
+
+        async with engine.begin() as conn:
+            await conn.exec_driver_sql(f"DROP TABLE {name}")
+        archived.append(archive.path)
+
+    # Old rows that never had a month partition sit in the default one.
+    async with engine.connect() as conn:
+        has_default = await conn.run_sync(_exists, DEFAULT_PARTITION)
+    if has_default:
+        archived += await _archive_rows(engine, cutoff, directory, DEFAULT_PARTITION)
+    return archived
+
+
+async def _archive_rows(
+    engine: AsyncEngine, cutoff: date, directory: Path, table: str = PARENT
+) -> list[Path]:
+    limit = datetime.combine(cutoff, time.min, tzinfo=timezone.utc)
+    archived = []
+    archive: ArchiveFile | None = None
+    archive_month: date | None = None
+    async with engine.connect() as conn:
+        result = await conn.stream(
+            text(
+                f"SELECT {', '.join(COLUMNS)} FROM {table} "
+                "WHERE created_at < :limit ORDER BY created_at, id"
+            ),
+            {"limit": limit},
+            execution_options={"yield_per": ARCHIVE_CHUNK},
+        )
+        async for chunk in result.partitions(ARCHIVE_CHUNK):
+            while chunk:
+                month = month_start(_as_datetime(chunk[0].created_at).date())
+                if archive is None or month != archive_month:
+                    if archive is not None:
+                        await archive.finish()
+                        archived.append(archive.path)
+                    archive = ArchiveFile(_archive_path(directory, table, month))
+                    archive_month = month
+                end = add_months(month, 1)
+                split = next(
+                    (
+                        index
+                        for index, row in enumerate(chunk)
+                        if _as_datetime(row.created_at).date() >= end
+                    ),
+                    len(chunk),
+                )
+                await archive.write(chunk[:split])
+                chunk = chunk[split:]
+    if archive is None:
+        return archived
+    await archive.finish()
+    archived.append(archive.path)
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(f"DELETE FROM {table} WHERE created_at < :limit"), {"limit": limit}
+        )
+    return archived
+
+
+def _as_datetime(value: datetime | str) -> datetime:
+    # SQLite returns timestamps from textual queries as strings.
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class ReadingMaintenance:
+    """Keeps future partitions created and, if enabled, archives old months.
+
+    Runs at startup and then every `interval` seconds. With several bot
+    processes only the one holding the advisory lock does the work.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        *,
+        ahead: int = 2,
+        keep_months: int = 0,
+        directory: Path = Path("archive"),
+        interval: float = 6 * 3600,
+    ) -> None:
+        self.engine = engine
+        self.ahead = ahead
+        self.keep_months = keep_months
+        self.directory = directory
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> None:
+        postgres = self.engine.dialect.name == "postgresql"
+        async with self.engine.connect() as lock_conn:
+            if postgres:
+                locked = await lock_conn.scalar(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": _LOCK_KEY}
+                )
+                await lock_conn.commit()
+                if not locked:
+                    return
+            try:
+                async with self.engine.begin() as conn:
+                    await conn.run_sync(ensure_partitions, self.ahead)
+                if self.keep_months > 0:
+                    await archive_readings(
+                        self.engine, keep_months=self.keep_months, directory=self.directory
+                    )
+            finally:
+                if postgres:
+                    await lock_conn.execute(
+                        text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY}
+                    )
+                    await lock_conn.commit()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:  # noqa: BLE001
+                logger.exception("Reading maintenance failed")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,171 @@
+"""Background processing of callback queries after they are acknowledged.
+
+Handlers answer the callback query at once, so the button stops spinning,
+and submit the actual work here. Jobs run on a fixed number of workers, and
+jobs with the same key (the user id) always go to the same worker, so one
+user's taps are handled in the order they arrived. When `max_pending` jobs
+are already waiting new ones are refused, and the caller tells the user the
+bot is busy instead of letting the queue and the latency grow.
+
+`TapGuard` sits in front of the pipeline for buttons users tend to tap
+repeatedly, so a burst of taps costs one reading rather than one each.
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from .diagnostics import report_update
+from .logs import correlation_id
+from .metrics import (
+    CALLBACK_JOB_SECONDS,
+    CALLBACK_QUEUE_SECONDS,
+    CALLBACKS_SHED,
+    TAPS_DROPPED,
+    UPDATE_DB_QUERIES,
+    UpdateCost,
+    update_cost,
+)
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[None]]
+# Enqueue time, job name, correlation id of the submitting update, job.
+_Entry = tuple[float, str, str, Job]
+
+
+class CallbackPipeline:
+    def __init__(self, *, workers: int = 16, max_pending: int = 1000) -> None:
+        self.max_pending = max(1, max_pending)
+        self.pending = 0
+        self.processed = 0
+        self.failed = 0
+        self._queues: list[asyncio.Queue[_Entry]] = [
+            asyncio.Queue() for _ in range(max(1, workers))
+        ]
+        self._tasks: list[asyncio.Task] = []
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "workers": len(self._queues),
+            "pending": self.pending,
+            "processed": self.processed,
+            "failed": self.failed,
+            "shed": CALLBACKS_SHED.total(),
+        }
+
+    def submit(self, key: int, job: Job, name: str = "job") -> bool:
+        """Queue `job` behind the earlier jobs of `key`; False if the pipeline is full."""
+        if self.pending >= self.max_pending:
+            CALLBACKS_SHED.inc()
+            return False
+        if not self._tasks:
+            # Workers outlive the update that started them; don't inherit its context.
+            self._tasks = [
+                asyncio.create_task(self._work(queue), context=contextvars.Context())
+                for queue in self._queues
+            ]
+        self.pending += 1
+        self._queues[key % len(self._queues)].put_nowait(
+            (time.perf_counter(), name, correlation_id.get(), job)
+        )
+        return True
+
+    async def _work(self, queue: asyncio.Queue[_Entry]) -> None:
+        while True:
+            enqueued_at, name, update, job = await queue.get()
+            correlation_id.set(update)
+            started = time.perf_counter()
+            CALLBACK_QUEUE_SECONDS.observe(started - enqueued_at)
+            cost = UpdateCost()
+            token = update_cost.set(cost)
+            status = "ok"
+            try:
+                await job()
+                self.processed += 1
+            except Exception:  # noqa: BLE001
+                status = "error"
+                self.failed += 1
+                logger.exception("Callback job %s failed", name)
+            finally:
+                elapsed = time.perf_counter() - started
+                CALLBACK_JOB_SECONDS.observe(elapsed, job=name, status=status)
+                UPDATE_DB_QUERIES.observe(cost.queries, handler=f"{name}:job")
+                report_update(f"{name}:job", cost, elapsed)
+                update_cost.reset(token)
+                self.pending -= 1
+                queue.task_done()
+
+    async def close(self, timeout: float = 10) -> None:
+        """Finish the queued jobs, then stop the workers."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Stopping with %s callback jobs pending", self.pending)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+class TapGuard:
+    """Lets one tap per user through at a time and debounces the ones right after.
+
+    A tap arriving while the user's previous one is still being handled, or
+    less than `window` seconds after it finished, is dropped: the reading
+    already on its way answers it. Finished entries are kept in completion
+    order and forgotten once the window has passed, and never more than
+    `max_entries` of them are kept.
+    """
+
+    def __init__(self, *, window: float = 1.0, max_entries: int = 10_000) -> None:
+        self.window = window
+        self.max_entries = max_entries
+        self._in_flight: set[int] = set()
+        self._finished: OrderedDict[int, float] = OrderedDict()
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "in_flight": len(self._in_flight),
+            "debouncing": len(self._finished),
+            "dropped_in_flight": TAPS_DROPPED.value(reason="in_flight"),
+            "dropped_debounce": TAPS_DROPPED.value(reason="debounce"),
+        }
+
+    def in_flight(self, key: int) -> bool:
+        return key in self._in_flight
+
+    def enter(self, key: int) -> bool:
+        """Claim `key` for a new tap; False if the tap should be dropped."""
+        now = time.monotonic()
+        self._expire(now)
+        if key in self._in_flight:
+            TAPS_DROPPED.inc(reason="in_flight")
+            return False
+        if key in self._finished:
+            TAPS_DROPPED.inc(reason="debounce")
+            return False
+        self._in_flight.add(key)
+        return True
+
+    def leave(self, key: int, *, debounce: bool = True) -> None:
+        """Release `key`; with `debounce` further taps are dropped for `window` seconds."""
+        self._in_flight.discard(key)
+        if not debounce or self.window <= 0:
+            return
+        self._finished[key] = time.monotonic() + self.window
+        self._finished.move_to_end(key)
+        while len(self._finished) > self.max_entries:
+            self._finished.popitem(last=False)
+
+    def _expire(self, now: float) -> None:
+        while self._finished:
+            key, until = next(iter(self._finished.items()))
+            if until > now:
+                break
+            del self._finished[key]
@@ -0,0 +1,113 @@
+import logging
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Callable, Iterable
+
+from sqlalchemy import false, func, select
+
+from .models import Reading
+
+logger = logging.getLogger(__name__)
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+class DailyQuotaCache:
+    """LRU of today's regular reading counts keyed by (user_id, UTC date).
+
+    Entries only ever describe the current UTC day: the whole cache is dropped
+    when the date rolls over, so a stale count can never leak into tomorrow.
+    """
+
+    def __init__(self, max_entries: int = 100_000) -> None:
+        self.max_entries = max_entries
+        self._day = utc_today()
+        self._counts: OrderedDict[int, int] = OrderedDict()
+
+    def __len__(self) -> int:
+        self._roll()
+        return len(self._counts)
+
+    def _roll(self) -> date:
+        today = utc_today()
+        if today != self._day:
+            logger.debug("Quota cache rolled over to %s, dropped %s entries", today, len(self._counts))
+            self._day = today
+            self._counts.clear()
+        return today
+
+    def get(self, user_id: int) -> int | None:
+        self._roll()
+        count = self._counts.get(user_id)
+        if count is not None:
+            self._counts.move_to_end(user_id)
+        return count
+
+    def set(self, user_id: int, count: int, day: date | None = None) -> None:
+        if self._roll() != (day or self._day):
+            return
+        self._counts[user_id] = count
+        self._counts.move_to_end(user_id)
+        while len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+
+    def warm(self, user_id: int, count: int, day: date | None = None) -> None:
+        """Store a count loaded from the database unless one is cached already."""
+        if user_id not in self._counts:
+            self.set(user_id, count, day=day)
+
+    def try_reserve(self, user_id: int, limit: int) -> bool:
+        """Count a reading in advance if the user is still under the limit.
+
+        Check and increment happen without yielding to the event loop, so
+        concurrent taps of one user cannot both take the last slot.
+        """
+        count = self.get(user_id)
+        if count is None or count >= limit:
+            return False
+        self._counts[user_id] = count + 1
+        return True
+
+    def release(self, user_id: int) -> None:
+        count = self.get(user_id)
+        if count:
+            self._counts[user_id] = count - 1
+
+    async def reconcile(
+        self,
+        session,
+        user_ids: Iterable[int] | None = None,
+        pending: Callable[[int, date], int] | None = None,
+    ) -> int:
+        """Reload counts from the database.
+
+        Without `user_ids` every user with readings today is loaded (up to the
+        cache size), which is what a freshly restarted process wants.
+        `pending` adds readings that are accepted but not written yet.
+        """
+        today = self._roll()
+        start = datetime.combine(today, time.min, tzinfo=timezone.utc)
+        stmt = (
+            select(Reading.user_id, func.count(Reading.id))
+            .where(Reading.is_spontaneous == false())
+            .where(Reading.created_at >= start)
+            .where(Reading.created_at < start + timedelta(days=1))
+            .group_by(Reading.user_id)
+            .limit(self.max_entries)
+        )
+        wanted = None
+        if user_ids is not None:
+            wanted = list(user_ids)
+            stmt = stmt.where(Reading.user_id.in_(wanted))
+        result = await session.execute(stmt)
+        counts = dict(result.all())
+        for user_id in wanted or ():
+            counts.setdefault(user_id, 0)
+        for user_id, count in counts.items():
+            if pending is not None:
+                count += pending(user_id, today)
+            self.set(user_id, int(count), day=today)
+        logger.info("Reconciled daily quota cache with %s users", len(counts))
+        return len(counts)
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .models import Reading
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PendingReading:
+    user_id: int
+    arcana_id: int
+    prediction_index: int
+    variant: int
+    is_spontaneous: bool
+    created_at: datetime
+
+
+class ReadingWriter:
+    """Write-behind buffer that persists readings in batches.
+
+    Rows are flushed when `batch_size` of them are queued or `flush_interval`
+    seconds after the first one arrived, whichever comes first. The queue is
+    bounded: once `max_pending` rows wait for the database, `add` blocks and
+    slows handlers down instead of growing memory.
+    """
+
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        *,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_pending: int = 10_000,
+        synchronous_commit: bool = True,
+    ) -> None:
+        self.sessionmaker = sessionmaker
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.synchronous_commit = synchronous_commit
+        self._queue: asyncio.Queue[PendingReading | None] = asyncio.Queue(maxsize=max_pending)
+        self._unflushed: Counter[tuple[int, date]] = Counter()
+        self._task: asyncio.Task | None = None
+
+    def pending_regular(self, user_id: int, day: date) -> int:
+        """Regular readings of the user on `day` that are not in the database yet."""
+        return self._unflushed.get((user_id, day), 0)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                "Reading write-behind started (batch=%s, interval=%ss, queue=%s)",
+                self.batch_size,
+                self.flush_interval,
+                self._queue.maxsize,
+            )
+
+    async def add(self, reading: PendingReading) -> None:
+        if not reading.is_spontaneous:
+            self._unflushed[(reading.user_id, reading.created_at.date())] += 1
+        if self._queue.full():
+            logger.warning("Reading write-behind queue is full, waiting for a flush")
+        await self._queue.put(reading)
+
+    async def close(self) -> None:
+        """Flush everything that is queued and stop the background task."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        logger.info("Reading write-behind stopped")
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            await self._flush(batch, retries=3 if closing else None)
+
+    async def _flush(self, batch: list[PendingReading], retries: int | None = None) -> None:
+        attempt = 0
+        while True:
+            try:
+                async with self.sessionmaker() as session:
+                    if not self.synchronous_commit and session.bind.dialect.name == "postgresql":
+                        await session.execute(text("SET LOCAL synchronous_commit = off"))
+                    await session.execute(insert(Reading), [asdict(reading) for reading in batch])
+                    await session.commit()
+                break
+            except Exception:  # noqa: BLE001
+                attempt += 1
+                logger.exception("Failed to flush %s readings (attempt %s)", len(batch), attempt)
+                if retries is not None and attempt > retries:
+                    logger.error("Dropping %s unflushed readings", len(batch))
+                    break
+                await asyncio.sleep(min(2**attempt, 30))
+
+        for reading in batch:
+            if reading.is_spontaneous:
+                continue
+            key = (reading.user_id, reading.created_at.date())
+            self._unflushed[key] -= 1
+            if self._unflushed[key] <= 0:
+                del self._unflushed[key]
+        logger.debug("Flushed %s readings", len(batch))
@@ -0,0 +1,270 @@
+"""Daily rollups of readings, kept up to date from a high-water mark.
+
+The job reads readings with ids above the last processed one, in batches,
+and adds them to per-day counters: readings per arcana and variant, daily
+totals and daily active users (users who asked for a reading themselves).
+Readings newer than `settle` seconds are left for the next run, so rows
+whose transactions commit slightly out of id order are not skipped.
+Statistics are then read from the rollups only, in time that does not
+depend on how many readings are stored.
+"""
+
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from . import catalog
+from .db import dialect_insert
+from .locales import get_catalog
+from .models import DailyActiveUser, DailyTotal, Reading, ReadingDailyStat, RollupState
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_NAME = "readings"
+INSERT_CHUNK = 1000
+
+
+def _utc_day(value: datetime) -> date:
+    if value.tzinfo is None:
+        return value.date()
+    return value.astimezone(timezone.utc).date()
+
+
+class ReadingRollup:
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        *,
+        batch_size: int = 10_000,
+        interval: float = 60.0,
+        settle: float = 60.0,
+    ) -> None:
+        self.sessionmaker = sessionmaker
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.settle = timedelta(seconds=settle)
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:  # noqa: BLE001
+                logger.exception("Reading rollup failed")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """Roll up everything that has settled; returns the number of readings added."""
+        total = 0
+        while True:
+            added, more = await self._step()
+            total += added
+            if not more:
+                break
+        if total:
+            logger.info("Rolled up %s readings", total)
+        return total
+
+    async def _step(self) -> tuple[int, bool]:
+        async with self.sessionmaker() as session:
+            await session.execute(
+                dialect_insert(RollupState)
+                .values(name=ROLLUP_NAME, last_id=0)
+                .on_conflict_do_nothing()
+            )
+            state = (
+                await session.execute(
+                    select(RollupState).where(RollupState.name == ROLLUP_NAME).with_for_update()
+                )
+            ).scalar_one()
+
+            rows = (
+                await session.execute(
+                    select(
+                        Reading.id,
+                        Reading.user_id,
+                        Reading.arcana_id,
+                        Reading.variant,
+                        Reading.is_spontaneous,
+                        Reading.created_at,
+                    )
+                    .where(Reading.id > state.last_id)
+                    .order_by(Reading.id)
+                    .limit(self.batch_size)
+                )
+            ).all()
+            full_batch = len(rows) == self.batch_size
+            settled_before = datetime.now(timezone.utc) - self.settle
+            for index, row in enumerate(rows):
+                created_at = row.created_at
+                if created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+                if created_at >= settled_before:
+                    rows = rows[:index]
+                    full_batch = False
+                    break
+            if not rows:
+                await session.commit()
+                return 0, False
+
+            await self._apply(session, rows)
+            state.last_id = rows[-1].id
+            state.updated_at = datetime.now(timezone.utc)
+            await session.commit()
+        return len(rows), full_batch
+
+    async def _apply(self, session: AsyncSession, rows: list) -> None:
+        per_arcana: dict[tuple[date, int, int], list[int]] = defaultdict(lambda: [0, 0])
+        per_day: dict[date, list[int]] = defaultdict(lambda: [0, 0])
+        active: set[tuple[date, int]] = set()
+        for row in rows:
+            day = _utc_day(row.created_at)
+            slot = 1 if row.is_spontaneous else 0
+            per_arcana[(day, row.arcana_id, row.variant)][slot] += 1
+            per_day[day][slot] += 1
+            if not row.is_spontaneous:
+                active.add((day, row.user_id))
+
+        new_active: Counter[date] = Counter()
+        active_rows = [{"day": day, "user_id": user_id} for day, user_id in active]
+        for start in range(0, len(active_rows), INSERT_CHUNK):
+            result = await session.execute(
+                dialect_insert(DailyActiveUser)
+                .values(active_rows[start : start + INSERT_CHUNK])
+                .on_conflict_do_nothing()
+                .returning(DailyActiveUser.day)
+            )
+            new_active.update(result.scalars())
+
+        stats = dialect_insert(ReadingDailyStat).values(
+            [
+                {
+                    "day": day,
+                    "arcana_id": arcana_id,
+                    "variant": variant,
+                    "readings": readings,
+                    "spontaneous": spontaneous,
+                }
+                for (day, arcana_id, variant), (readings, spontaneous) in per_arcana.items()
+            ]
+        )
+        await session.execute(
+            stats.on_conflict_do_update(
+                index_elements=["day", "arcana_id", "variant"],
+                set_={
+                    "readings": ReadingDailyStat.readings + stats.excluded.readings,
+                    "spontaneous": ReadingDailyStat.spontaneous + stats.excluded.spontaneous,
+                },
+            )
+        )
+
+        totals = dialect_insert(DailyTotal).values(
+            [
+                {
+                    "day": day,
+                    "readings": readings,
+                    "spontaneous": spontaneous,
+                    "active_users": new_active[day],
+                }
+                for day, (readings, spontaneous) in per_day.items()
+            ]
+        )
+        await session.execute(
+            totals.on_conflict_do_update(
+                index_elements=["day"],
+                set_={
+                    "readings": DailyTotal.readings + totals.excluded.readings,
+                    "spontaneous": DailyTotal.spontaneous + totals.excluded.spontaneous,
+                    "active_users": DailyTotal.active_users + totals.excluded.active_users,
+                },
+            )
+        )
+
+
+@dataclass
+class StatsReport:
+    today: date
+    days: list[DailyTotal] = field(default_factory=list)
+    arcana: list[tuple[str, int]] = field(default_factory=list)
+    genders: dict[str, int] = field(default_factory=dict)
+    updated_at: datetime | None = None
+
+
+async def load_report(session: AsyncSession, today: date, days: int = 7) -> StatsReport:
+    """Totals for the last `days` days and today's breakdown, from rollups only."""
+    report = StatsReport(today=today)
+    report.days = list(
+        (
+            await session.execute(
+                select(DailyTotal)
+                .where(DailyTotal.day > today - timedelta(days=days))
+                .where(DailyTotal.day <= today)
+                .order_by(DailyTotal.day.desc())
+            )
+        ).scalars()
+    )
+
+    per_arcana: Counter[int] = Counter()
+    genders: Counter[str] = Counter()
+    result = await session.execute(
+        select(ReadingDailyStat.arcana_id, ReadingDailyStat.variant, ReadingDailyStat.readings)
+        .where(ReadingDailyStat.day == today)
+    )
+    for arcana_id, variant, readings in result.all():
+        per_arcana[arcana_id] += readings
+        genders[catalog.VARIANTS[variant][1] if variant in catalog.VARIANTS else "?"] += readings
+    report.arcana = [
+        (catalog.arcana_name(arcana_id), count) for arcana_id, count in per_arcana.most_common(5)
+    ]
+    report.genders = dict(genders)
+    report.updated_at = (
+        await session.execute(
+            select(RollupState.updated_at).where(RollupState.name == ROLLUP_NAME)
+        )
+    ).scalar_one_or_none()
+    return report
+
+
+def format_report(report: StatsReport, locale: str | None = None) -> str:
+    texts = get_catalog(locale)
+    if not report.days and not report.arcana:
+        return texts.messages["stats_empty"]
+    updated = f"{report.updated_at:%Y-%m-%d %H:%M} UTC" if report.updated_at else "—"
+    lines = [texts.messages["stats_header"].format(day=report.today, updated=updated)]
+    for total in report.days:
+        lines.append(
+            texts.messages["stats_day"].format(
+                day=total.day,
+                readings=total.readings,
+                spontaneous=total.spontaneous,
+                active=total.active_users,
+            )
+        )
+    if report.arcana:
+        items = ", ".join(f"{name} — {count}" for name, count in report.arcana)
+        lines.append(texts.messages["stats_top_arcana"].format(items=items))
+    if report.genders:
+        items = ", ".join(
+            f"{texts.gender_labels.get(gender, gender)} — {count}"
+            for gender, count in sorted(report.genders.items())
+        )
+        lines.append(texts.messages["stats_genders"].format(items=items))
+    return "\n".join(lines)
@@ -0,0 +1,157 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .db import dialect_insert
+from .models import ScheduledDeletion
+
+logger = logging.getLogger(__name__)
+
+DeleteFunc = Callable[[int, int], Awaitable[None]]
+
+
+class DeletionScheduler:
+    """Deletes messages at their due time from a single background loop.
+
+    Due times live in a heap and are mirrored to `scheduled_deletions`, so
+    deletions that were pending during a restart still happen afterwards.
+    Due rows are claimed by deleting them before the messages are deleted,
+    so several bot workers sharing the table never delete a message twice.
+    """
+
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        *,
+        batch_size: int = 100,
+    ) -> None:
+        self.sessionmaker = sessionmaker
+        self.batch_size = max(1, batch_size)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.deleted = 0
+        self._heap: list[tuple[float, int, int, bool]] = []
+        self._wakeup = asyncio.Event()
+        self._delete: DeleteFunc | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "pending": self.pending,
+            "deleted": self.deleted,
+            "last_lag_seconds": self.last_lag,
+            "max_lag_seconds": self.max_lag,
+        }
+
+    async def schedule(self, chat_id: int, message_id: int, delay: float) -> None:
+        due = time.time() + delay
+        persisted = True
+        try:
+            async with self.sessionmaker() as session:
+                await session.execute(
+                    dialect_insert(ScheduledDeletion)
+                    .values(
+                        chat_id=chat_id,
+                        message_id=message_id,
+                        due_at=datetime.fromtimestamp(due, timezone.utc),
+                    )
+                    .on_conflict_do_nothing()
+                )
+                await session.commit()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Failed to persist deletion of message %s: %s", message_id, exc)
+            persisted = False
+
+        if not self._heap or due < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (due, chat_id, message_id, persisted))
+
+    async def start(self, delete_message: DeleteFunc) -> None:
+        self._delete = delete_message
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(
+                    ScheduledDeletion.due_at,
+                    ScheduledDeletion.chat_id,
+                    ScheduledDeletion.message_id,
+                )
+            )
+            for due_at, chat_id, message_id in result.all():
+                if due_at.tzinfo is None:
+                    due_at = due_at.replace(tzinfo=timezone.utc)
+                heapq.heappush(self._heap, (due_at.timestamp(), chat_id, message_id, True))
+        logger.info("Deletion scheduler started with %s pending deletions", self.pending)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            now = time.time()
+            due: list[tuple[float, int, int, bool]] = []
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                due.append(heapq.heappop(self._heap))
+            self.last_lag = now - due[0][0]
+            self.max_lag = max(self.max_lag, self.last_lag)
+
+            keys = [(chat_id, message_id) for _, chat_id, message_id, persisted in due if persisted]
+            claimed = await self._claim(keys) if keys else set()
+            targets = [
+                (chat_id, message_id)
+                for _, chat_id, message_id, persisted in due
+                if not persisted or (chat_id, message_id) in claimed
+            ]
+            await asyncio.gather(
+                *(self._delete(chat_id, message_id) for chat_id, message_id in targets),
+                return_exceptions=True,
+            )
+            self.deleted += len(targets)
+
+    async def _claim(self, keys: list[tuple[int, int]]) -> set[tuple[int, int]]:
+        """Remove due rows and return the ones this process removed."""
+        try:
+            async with self.sessionmaker() as session:
+                result = await session.execute(
+                    delete(ScheduledDeletion)
+                    .where(
+                        tuple_(ScheduledDeletion.chat_id, ScheduledDeletion.message_id).in_(keys)
+                    )
+                    .returning(ScheduledDeletion.chat_id, ScheduledDeletion.message_id)
+                )
+                claimed = {(chat_id, message_id) for chat_id, message_id in result.all()}
+                await session.commit()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Failed to claim %s due deletions: %s", len(keys), exc)
+            return set(keys)
+        return claimed
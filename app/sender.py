@@ -0,0 +1,230 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, TypeVar
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from .metrics import DELETE_FAILURES
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PRIORITY_REPLY = 0
+PRIORITY_CLEANUP = 1
+PRIORITY_BROADCAST = 2
+
+# Telegram accepts at most 100 ids per deleteMessages call.
+MAX_DELETE_BATCH = 100
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 when one is available now)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class OutboundLimiter:
+    """Throttles Bot API calls with a global and a per-chat token bucket.
+
+    Callers wait in a priority queue, so user-facing replies overtake cleanup
+    deletes when the bot is over its limits. A 429 pauses the chat's bucket,
+    and the global one too when the wait exceeds the chat's own interval.
+    Deletes are queued without waiting, and deletes that pile up for one chat
+    go out as a single `deleteMessages` call.
+    """
+
+    def __init__(
+        self,
+        *,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: int = 3,
+        max_retries: int = 3,
+        max_chats: int = 100_000,
+    ) -> None:
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: OrderedDict[int, TokenBucket] = OrderedDict()
+        self._waiters: list[tuple[int, int, int, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._pump_task: asyncio.Task | None = None
+        self._delete_batches: dict[int, list[int]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+        self.granted = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.retries = 0
+        self.coalesced_deletes = 0
+        self.delete_failures = 0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "queue_depth": len(self._waiters),
+            "pending_deletes": sum(len(batch) for batch in self._delete_batches.values()),
+            "granted": self.granted,
+            "wait_avg_seconds": self.wait_total / self.granted if self.granted else 0.0,
+            "wait_max_seconds": self.wait_max,
+            "retries": self.retries,
+            "coalesced_deletes": self.coalesced_deletes,
+            "delete_failures": self.delete_failures,
+        }
+
+    def _chat(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+            while len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    def _grant(self, chat_id: int, enqueued_at: float) -> None:
+        self._global.take()
+        self._chat(chat_id).take()
+        waited = time.monotonic() - enqueued_at
+        self.granted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    async def acquire(self, chat_id: int, priority: int = PRIORITY_REPLY) -> None:
+        now = time.monotonic()
+        if (
+            not self._waiters
+            and self._global.delay(now) == 0
+            and self._chat(chat_id).delay(now) == 0
+        ):
+            self._grant(chat_id, now)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), chat_id, now, future))
+        self._wakeup.set()
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self) -> None:
+        while self._waiters:
+            now = time.monotonic()
+            wait = self._global.delay(now)
+            if wait == 0:
+                ready = None
+                wait = float("inf")
+                for entry in sorted(self._waiters):
+                    if entry[4].done():
+                        ready = entry
+                        break
+                    chat_wait = self._chat(entry[2]).delay(now)
+                    if chat_wait == 0:
+                        ready = entry
+                        break
+                    wait = min(wait, chat_wait)
+                if ready is not None:
+                    self._waiters.remove(ready)
+                    heapq.heapify(self._waiters)
+                    _, _, chat_id, enqueued_at, future = ready
+                    if not future.done():
+                        self._grant(chat_id, enqueued_at)
+                        future.set_result(None)
+                    continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def call(
+        self,
+        chat_id: int,
+        request: Callable[[], Awaitable[T]],
+        priority: int = PRIORITY_REPLY,
+    ) -> T:
+        """Run `request` once the limits allow, retrying after a 429."""
+        attempt = 0
+        while True:
+            await self.acquire(chat_id, priority)
+            try:
+                return await request()
+            except TelegramRetryAfter as exc:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                self.retries += 1
+                logger.warning(
+                    "Flood control in chat %s, retrying in %ss", chat_id, exc.retry_after
+                )
+                self._chat(chat_id).pause(exc.retry_after)
+                # A wait longer than the chat's own interval means the bot as
+                # a whole is over the limit, so hold every chat back too.
+                if exc.retry_after * self.chat_rate > 1:
+                    self._global.pause(exc.retry_after)
+
+    def delete(self, bot: Bot, chat_id: int, message_id: int) -> None:
+        """Queue a message deletion, merging it with deletes pending for the chat."""
+        batch = self._delete_batches.get(chat_id)
+        if batch is not None and len(batch) < MAX_DELETE_BATCH:
+            if message_id not in batch:
+                batch.append(message_id)
+                self.coalesced_deletes += 1
+            return
+        batch = [message_id]
+        self._delete_batches[chat_id] = batch
+        task = asyncio.create_task(self._flush_deletes(bot, chat_id, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush_deletes(self, bot: Bot, chat_id: int, batch: list[int]) -> None:
+        def request() -> Awaitable[Any]:
+            if self._delete_batches.get(chat_id) is batch:
+                del self._delete_batches[chat_id]
+            if len(batch) == 1:
+                return bot.delete_message(chat_id, batch[0])
+            return bot.delete_messages(chat_id, list(batch))
+
+        try:
+            await self.call(chat_id, request, PRIORITY_CLEANUP)
+            logger.debug("Deleted messages %s in chat %s", batch, chat_id)
+        except Exception as exc:  # noqa: BLE001
+            self.delete_failures += 1
+            DELETE_FAILURES.inc()
+            logger.debug("Failed to delete messages %s in chat %s: %s", batch, chat_id, exc)
+
+    async def close(self) -> None:
+        """Wait for queued deletes to go out."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pump_task is not None:
+            self._pump_task.cancel()
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from time import monotonic
+from typing import Awaitable, Callable
+
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .catalog import Card
+from .models import Reading, User
+from .user_cache import CachedUser
+
+logger = logging.getLogger(__name__)
+
+# Sends the reading and returns the card that was sent, or None on failure.
+SendFunc = Callable[[CachedUser], Awaitable[Card | None]]
+
+
+def _eligible(day: date):
+    return (
+        User.gender.is_not(None),
+        or_(
+            User.last_spontaneous_offer_date.is_(None),
+            User.last_spontaneous_offer_date < day,
+        ),
+    )
+
+
+class SpontaneousScheduler:
+    """Sends every user with a known gender one unsolicited reading a day.
+
+    Users are walked in id order with keyset pagination. Each page gets a
+    share of the remaining daylight window proportional to its size, and the
+    sends inside a page are jittered over that share. A page is claimed by
+    setting `last_spontaneous_offer_date` before anything is sent, so a
+    restart resumes with the unclaimed users and never sends twice in a day.
+    `last_spontaneous_at` is set in bulk once the page's sends are done.
+    """
+
+    def __init__(
+        self,
+        sessionmaker: async_sessionmaker[AsyncSession],
+        send: SendFunc,
+        *,
+        start_hour: int,
+        end_hour: int,
+        page_size: int = 200,
+    ) -> None:
+        self.sessionmaker = sessionmaker
+        self.send = send
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.page_size = max(1, page_size)
+        self.sent = 0
+        self.failed = 0
+        self._task: asyncio.Task | None = None
+
+    def window(self, day: date) -> tuple[datetime, datetime]:
+        start = datetime.combine(day, time(hour=self.start_hour), tzinfo=timezone.utc)
+        end = datetime.combine(day, time.min, tzinfo=timezone.utc) + timedelta(hours=self.end_hour)
+        return start, end
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            now = datetime.now(timezone.utc)
+            start, end = self.window(now.date())
+            if now >= end:
+                start, end = self.window(now.date() + timedelta(days=1))
+            if now < start:
+                logger.info("Next spontaneous readings window starts at %s", start)
+                await asyncio.sleep((start - now).total_seconds())
+                continue
+            try:
+                await self.run_window(start.date(), end)
+            except Exception:  # noqa: BLE001
+                logger.exception("Spontaneous readings run failed, retrying in a minute")
+                await asyncio.sleep(60)
+                continue
+            await asyncio.sleep(max(0.0, (end - datetime.now(timezone.utc)).total_seconds()) + 1)
+
+    async def run_window(self, day: date, end: datetime) -> None:
+        async with self.sessionmaker() as session:
+            remaining = (
+                await session.execute(select(func.count(User.id)).where(*_eligible(day)))
+            ).scalar_one()
+        logger.info("Sending spontaneous readings to %s users until %s", remaining, end)
+
+        cursor = 0
+        while remaining > 0:
+            async with self.sessionmaker() as session:
+                result = await session.execute(
+                    select(User)
+                    .where(User.id > cursor, *_eligible(day))
+                    .order_by(User.id)
+                    .limit(self.page_size)
+                )
+                page = [CachedUser.from_model(user) for user in result.scalars()]
+            if not page:
+                break
+            cursor = page[-1].id
+
+            claimed = await self._claim(page, day)
+            seconds_left = max(0.0, (end - datetime.now(timezone.utc)).total_seconds())
+            share = seconds_left * len(page) / max(remaining, len(page))
+            remaining -= len(page)
+            await self._send_page(claimed, share)
+
+    async def _claim(self, page: list[CachedUser], day: date) -> list[CachedUser]:
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                update(User)
+                .where(User.id.in_([user.id for user in page]), *_eligible(day))
+                .values(last_spontaneous_offer_date=day)
+                .returning(User.id)
+            )
+            claimed_ids = set(result.scalars())
+            await session.commit()
+        return [user for user in page if user.id in claimed_ids]
+
+    async def _send_page(self, users: list[CachedUser], share: float) -> None:
+        started = monotonic()
+        offsets = sorted(random.uniform(0, share) for _ in users)
+        random.shuffle(users)
+
+        readings: list[dict] = []
+        sent_at = datetime.now(timezone.utc)
+        for user, offset in zip(users, offsets):
+            delay = started + offset - monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                result = await self.send(user)
+            except Exception as exc:  # noqa: BLE001
+                logger.debug("Spontaneous reading to user %s failed: %s", user.id, exc)
+                result = None
+            if result is None:
+                self.failed += 1
+                continue
+            self.sent += 1
+            sent_at = datetime.now(timezone.utc)
+            readings.append(
+                {
+                    "user_id": user.id,
+                    "arcana_id": result.arcana_id,
+                    "prediction_index": result.prediction_index,
+                    "variant": result.variant,
+                    "is_spontaneous": True,
+                    "created_at": sent_at,
+                }
+            )
+
+        if not readings:
+            return
+        async with self.sessionmaker() as session:
+            await session.execute(insert(Reading), readings)
+            await session.execute(
+                update(User)
+                .where(User.id.in_([reading["user_id"] for reading in readings]))
+                .values(last_spontaneous_at=sent_at)
+            )
+            await session.commit()
+        logger.info("Sent %s spontaneous readings", len(readings))
@@ -1 +0,0 @@
-from .locales.ru import ARCANA, ARCANA_NAMES, Arcana, GenderLiteral, get_prediction
@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Immutable snapshot of the `User` columns handlers need."""
+
+    id: int
+    telegram_id: int
+    username: Optional[str]
+    gender: Optional[str]
+    language: Optional[str]
+
+    @classmethod
+    def from_model(cls, user) -> "CachedUser":
+        return cls(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            username=user.username,
+            gender=user.gender,
+            language=user.language,
+        )
+
+
+class UserCache:
+    """TTL + LRU cache of users keyed by Telegram id."""
+
+    def __init__(self, max_entries: int = 50_000, ttl: float = 300.0) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[float, CachedUser]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, telegram_id: int, username: Optional[str] = None) -> Optional[CachedUser]:
+        """Return the cached user unless it expired or the username changed."""
+        entry = self._entries.get(telegram_id)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic() and (not username or username == user.username):
+                self._entries.move_to_end(telegram_id)
+                self.hits += 1
+                return user
+            del self._entries[telegram_id]
+        self.misses += 1
+        return None
+
+    def put(self, user: CachedUser) -> CachedUser:
+        self._entries[user.telegram_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.telegram_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return user
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from collections import deque
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from .config import Settings
+from .front import update_chat_id
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Updates of one chat accepted ahead of processing.
+MAX_CHAT_BACKLOG = 20
+# Accepted updates across all chats, per processing slot.
+PENDING_PER_SLOT = 10
+
+
+class WebhookHandler:
+    """Feeds webhook updates into the dispatcher with bounded concurrency.
+
+    Updates of one chat are processed one after another in the order they
+    were received, so the order in which the front forwards them holds even
+    though they are acknowledged early. An update takes one of the
+    `max_concurrency` processing slots only once the previous update of its
+    chat is done, so a chat that floods the bot cannot occupy the slots with
+    updates that merely wait on each other. Instead each chat may have at
+    most MAX_CHAT_BACKLOG updates accepted (no more than the slot count),
+    and all chats together PENDING_PER_SLOT times the slot count. Past either
+    limit the request is acknowledged only when room frees up, so Telegram
+    (or the front) waits on the HTTP response instead of the bot piling up
+    background tasks.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        *,
+        secret_token: str = "",
+        max_concurrency: int = 100,
+    ) -> None:
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret_token = secret_token
+        slots = max(1, max_concurrency)
+        self._slots = asyncio.Semaphore(slots)
+        self._pending = asyncio.Semaphore(slots * PENDING_PER_SLOT)
+        self._chat_backlog = min(MAX_CHAT_BACKLOG, slots)
+        self._tasks: set[asyncio.Task] = set()
+        # Accepted updates of each chat that are not done yet, oldest first.
+        self._chats: dict[int, deque[asyncio.Task]] = {}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret_token and request.headers.get(SECRET_TOKEN_HEADER) != self.secret_token:
+            logger.warning("Rejected webhook request with invalid secret token")
+            return web.Response(status=401)
+        try:
+            payload = await request.json()
+            update = Update.model_validate(payload, context={"bot": self.bot})
+        except ValueError as exc:
+            logger.warning("Rejected malformed webhook payload: %s", exc)
+            return web.Response(status=400)
+
+        chat_id = update_chat_id(payload)
+        while len(backlog := self._chats.get(chat_id, ())) >= self._chat_backlog:
+            await asyncio.wait({backlog[0]})
+        await self._pending.acquire()
+        backlog = self._chats.setdefault(chat_id, deque())
+        task = asyncio.create_task(self._process(update, backlog[-1] if backlog else None))
+        backlog.append(task)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda done: self._forget(chat_id, done))
+        return web.Response()
+
+    def _forget(self, chat_id: int, task: asyncio.Task) -> None:
+        backlog = self._chats[chat_id]
+        backlog.remove(task)
+        if not backlog:
+            del self._chats[chat_id]
+
+    async def _process(self, update: Update, previous: asyncio.Task | None) -> None:
+        try:
+            if previous is not None:
+                await asyncio.wait({previous})
+            async with self._slots:
+                await self.dispatcher.feed_update(self.bot, update)
+        except Exception:  # noqa: BLE001
+            logger.exception("Failed to process update %s", update.update_id)
+        finally:
+            self._pending.release()
+
+    async def drain(self) -> None:
+        if self._tasks:
+            logger.info("Waiting for %s in-flight updates", len(self._tasks))
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def create_app(self, path: str) -> web.Application:
+        app = web.Application()
+        app.router.add_post(path, self.handle)
+        return app
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot, settings: Settings) -> None:
+    handler = WebhookHandler(
+        dispatcher,
+        bot,
+        secret_token=settings.webhook_secret,
+        max_concurrency=settings.max_concurrent_updates,
+    )
+    runner = web.AppRunner(handler.create_app(settings.webhook_path))
+    await runner.setup()
+    site = web.TCPSite(runner, settings.webhook_host, settings.webhook_port)
+    await site.start()
+    logger.info(
+        "Listening for webhook updates on %s:%s%s",
+        settings.webhook_host,
+        settings.webhook_port,
+        settings.webhook_path,
+    )
+
+    if settings.bot_mode == "webhook" and settings.webhook_url:
+        url = settings.webhook_url.rstrip("/") + settings.webhook_path
+        await bot.set_webhook(
+            url,
+            secret_token=settings.webhook_secret or None,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+        logger.info("Registered webhook %s", url)
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await handler.drain()
@@ -0,0 +1,48 @@
+"""Archive readings older than the retention period to compressed files.
+
+On PostgreSQL whole monthly partitions are detached, written to
+`<dir>/readings_YYYY_MM.csv.gz` and dropped; on SQLite the old rows are
+written the same way and deleted. Future partitions are created as well:
+
+    python -m scripts.archive_readings --keep-months 12 --dir archive
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+
+from app import models  # noqa: F401 - ensure models are registered
+from app.config import get_settings
+from app.db import get_engine, init_db
+from app.partitions import archive_readings, ensure_partitions
+
+
+async def _run(args: argparse.Namespace) -> None:
+    await init_db()
+    engine = get_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(ensure_partitions, args.ahead)
+    paths = await archive_readings(engine, keep_months=args.keep_months, directory=args.dir)
+    for path in paths:
+        print(f"{path} {path.stat().st_size} bytes")
+    if not paths:
+        print("Nothing to archive")
+    await engine.dispose()
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Archive old Tarot bot readings.")
+    parser.add_argument(
+        "--keep-months",
+        type=int,
+        default=settings.reading_retention_months or 12,
+        help="Full months to keep besides the current one",
+    )
+    parser.add_argument("--dir", type=Path, default=Path(settings.archive_dir))
+    parser.add_argument("--ahead", type=int, default=settings.reading_partitions_ahead)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,189 @@
-"""Create a PostgreSQL backup using `pg_dump`."""
+"""Back up the PostgreSQL database with `pg_dump`.
+
+A full backup creates a backup set `backups/tarobot-<timestamp>/` with the
+dump and a manifest. `-j` dumps tables in parallel (directory format) and
+`-Z` sets the compression. `--incremental` adds the readings created since
+the last backup of the newest set as a compressed chunk, with the users they
+may refer to, without dumping the rest of the database again:
+
+    python -m scripts.backup_db -j 4 -Z 6
+    python -m scripts.backup_db --incremental
+
+Every stage prints its duration and size.
+"""
 
 import argparse
+import asyncio
 import datetime as dt
-import os
 import subprocess
+import sys
+import time
 from pathlib import Path
 
-from sqlalchemy.engine.url import make_url
+from app.backups import (
+    Manifest,
+    dump_readings,
+    dump_users,
+    high_water_mark,
+    latest_set,
+    pg_connection,
+)
+from app.config import get_settings
+from app.db import get_engine
 
-from app.config import Settings
 
-
-def _default_output_path() -> Path:
+def _default_output_path(root: Path) -> Path:
     timestamp = dt.datetime.now().strftime("%Y%m%d-%H%M%S")
-    return Path("backups") / f"tarobot-{timestamp}.dump"
-
-
-def _build_pg_dump_command(output_path: Path) -> tuple[list[str], dict[str, str]]:
-    settings = Settings.load(require_bot_token=False)
-    url = make_url(settings.database_url)
-    pg_url = url.set(drivername="postgresql")
-
-    env = os.environ.copy()
-    if pg_url.password:
-        env["PGPASSWORD"] = pg_url.password
-
-    host = pg_url.host or "localhost"
-    port = str(pg_url.port or 5432)
-    user = pg_url.username or "postgres"
-    database = pg_url.database or "postgres"
-
-    cmd = [
-        "pg_dump",
-        "-h",
-        host,
-        "-p",
-        port,
-        "-U",
-        user,
-        "-F",
-        "c",
-        "-f",
-        str(output_path),
-        database,
-    ]
+    return root / f"tarobot-{timestamp}"
+
+
+def _size(path: Path) -> int:
+    if path.is_dir():
+        return sum(item.stat().st_size for item in path.rglob("*") if item.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+def _report(stage: str, started: float, path: Path | None = None, detail: str = "") -> None:
+    elapsed = time.perf_counter() - started
+    size = f"{_size(path) / 2**20:10.1f} MiB" if path is not None else " " * 14
+    print(f"{stage:12s} {elapsed:8.2f}s {size}  {detail or path or ''}".rstrip())
+
+
+def _build_pg_dump_command(
+    output_path: Path, *, dump_format: str, jobs: int, compress: str | None
+) -> tuple[list[str], dict[str, str]]:
+    connection, env, database = pg_connection(get_settings().database_url)
+    cmd = ["pg_dump", *connection, "-F", dump_format[0], "-f", str(output_path)]
+    if jobs > 1:
+        cmd += ["-j", str(jobs)]
+    if compress is not None:
+        cmd += ["-Z", compress]
+    cmd.append(database)
     return cmd, env
 
 
+def _chunk_level(compress: str | None) -> int:
+    # pg_dump also accepts e.g. "zstd:3"; chunks are gzip, so keep the level only.
+    level = (compress or "").rpartition(":")[2]
+    return min(max(int(level), 1), 9) if level.isdigit() else 6
+
+
+def _settled_before(settle: float) -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=settle)
+
+
+async def _with_engine(func, *args, **kwargs):  # noqa: ANN001, ANN002, ANN003
+    engine = get_engine()
+    try:
+        return await func(engine, *args, **kwargs)
+    finally:
+        await engine.dispose()
+
+
+def full_backup(args: argparse.Namespace) -> Path:
+    output = args.output or _default_output_path(args.dir)
+    output.mkdir(parents=True, exist_ok=False)
+    dump_format = args.format or ("directory" if args.jobs > 1 else "custom")
+    dump_name = "db" if dump_format == "directory" else "db.dump"
+
+    started = time.perf_counter()
+    # Users changed after this may be missing from the dump; the next increment has them.
+    users_since = _settled_before(args.settle)
+    hwm = asyncio.run(_with_engine(high_water_mark, settle=args.settle))
+    _report("hwm", started, detail=f"readings up to id {hwm}")
+
+    started = time.perf_counter()
+    cmd, env = _build_pg_dump_command(
+        output / dump_name, dump_format=dump_format, jobs=args.jobs, compress=args.compress
+    )
+    subprocess.run(cmd, env=env, check=True)
+    _report("pg_dump", started, output / dump_name)
+
+    Manifest(
+        created_at=dt.datetime.now(dt.timezone.utc).isoformat(),
+        dump=dump_name,
+        format=dump_format,
+        hwm=hwm,
+        users_since=users_since.isoformat(),
+    ).write(output)
+    return output
+
+
+def incremental_backup(args: argparse.Namespace) -> Path:
+    backup_set = args.output or latest_set(args.dir)
+    if backup_set is None:
+        raise SystemExit(f"No backup set in {args.dir}; run a full backup first")
+    manifest = Manifest.read(backup_set)
+    chunk = backup_set / f"readings-{manifest.hwm + 1:012d}.csv.gz"
+    users_chunk = backup_set / f"users-{dt.datetime.now():%Y%m%d-%H%M%S}.csv.gz"
+    users_since = _settled_before(args.settle)
+    level = _chunk_level(args.compress)
+
+    started = time.perf_counter()
+    rows, hwm = asyncio.run(
+        _with_engine(
+            dump_readings, chunk, after=manifest.hwm, settle=args.settle, compresslevel=level
+        )
+    )
+    if rows:
+        _report("readings", started, chunk, f"{rows} readings up to id {hwm}")
+        manifest.chunks.append(chunk.name)
+        manifest.hwm = hwm
+    else:
+        _report("readings", started, detail=f"no new readings after id {manifest.hwm}")
+
+    # After the readings, so every user they refer to is already committed.
+    started = time.perf_counter()
+    previous = manifest.users_since
+    users = asyncio.run(
+        _with_engine(
+            dump_users,
+            users_chunk,
+            since=dt.datetime.fromisoformat(previous) if previous else None,
+            compresslevel=level,
+        )
+    )
+    if users:
+        _report("users", started, users_chunk, f"{users} users changed since {previous}")
+        manifest.user_chunks.append(users_chunk.name)
+    else:
+        _report("users", started, detail=f"no users changed since {previous}")
+    manifest.users_since = users_since.isoformat()
+    manifest.write(backup_set)
+    return backup_set
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Create a PostgreSQL backup for the Tarot bot.")
     parser.add_argument(
         "-o",
         "--output",
         type=Path,
-        default=_default_output_path(),
-        help="Path to save the dump (default: backups/tarobot-<timestamp>.dump)",
+        help="Backup set directory (default: <dir>/tarobot-<timestamp>, or the newest set "
+        "with --incremental)",
+    )
+    parser.add_argument("--dir", type=Path, default=Path("backups"), help="Backup sets root")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Parallel pg_dump jobs")
+    parser.add_argument(
+        "-F", "--format", choices=["custom", "directory"], help="pg_dump format"
+    )
+    parser.add_argument(
+        "-Z", "--compress", help="Compression level or method:level, e.g. 6 or zstd:3"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true", help="Only add readings since the last backup"
+    )
+    parser.add_argument(
+        "--settle", type=float, default=60.0, help="Leave readings newer than this for later"
     )
     args = parser.parse_args()
+    if args.jobs > 1 and args.format == "custom":
+        parser.error("parallel dumps (-j) need the directory format")
 
-    output_path = args.output
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-    cmd, env = _build_pg_dump_command(output_path)
-    subprocess.run(cmd, env=env, check=True)
-    print(f"Backup saved to {output_path}")
+    started = time.perf_counter()
+    backup_set = incremental_backup(args) if args.incremental else full_backup(args)
+    _report("total", started, backup_set)
+    print(f"Backup saved to {backup_set}", file=sys.stderr)
 
 
 if __name__ == "__main__":
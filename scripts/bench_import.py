@@ -0,0 +1,117 @@
+"""Guard the cold-start import time of the bot and the maintenance scripts.
+
+Each module is imported in a fresh interpreter with `python -X importtime`
+and without `BOT_TOKEN`, so an import that loads settings eagerly or opens
+the database engine fails here. The best of `--runs` cumulative times is
+reported with the heaviest packages it pulled in. Scripts that only touch
+the database must not import aiogram or aiohttp:
+
+    python -m scripts.bench_import --max-ms 3000 --max-script-ms 800
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+BOT_MODULES = ("app.bot", "app.front")
+SCRIPT_MODULES = (
+    "scripts.backup_db",
+    "scripts.restore_db",
+    "scripts.reset_db",
+    "scripts.stats",
+    "scripts.archive_readings",
+    "scripts.compact_readings",
+)
+SCRIPT_FORBIDDEN = ("aiogram", "aiohttp")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+_CHECK = """
+import sys
+import {module}
+db = sys.modules.get("app.db")
+if db is not None and db._engine is not None:
+    raise SystemExit("importing {module} created the database engine")
+"""
+
+
+def _import_times(module: str) -> dict[str, tuple[int, int]]:
+    """Cumulative import time and nesting depth of every module, in microseconds."""
+    env = {key: value for key, value in os.environ.items() if key != "BOT_TOKEN"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHECK.format(module=module)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            times[match[4]] = (int(match[2]), len(match[3]))
+    return times
+
+
+def _measure(module: str, runs: int) -> tuple[float, dict[str, tuple[int, int]]]:
+    best: tuple[float, dict[str, tuple[int, int]]] | None = None
+    for _ in range(runs):
+        times = _import_times(module)
+        total = times[module][0] / 1000
+        if best is None or total < best[0]:
+            best = (total, times)
+    assert best is not None
+    return best
+
+
+def _heaviest(times: dict[str, tuple[int, int]], module: str, count: int = 4) -> str:
+    packages = [
+        (cumulative, name)
+        for name, (cumulative, _) in times.items()
+        if "." not in name and name != module.split(".")[0]
+    ]
+    packages.sort(reverse=True)
+    return ", ".join(f"{name} {cumulative / 1000:.0f}ms" for cumulative, name in packages[:count])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure cold-start import time.")
+    parser.add_argument("--runs", type=int, default=3, help="Imports per module; best is kept")
+    parser.add_argument("--max-ms", type=float, default=0.0, help="Fail above this for the bot")
+    parser.add_argument(
+        "--max-script-ms", type=float, default=0.0, help="Fail above this for the scripts"
+    )
+    args = parser.parse_args()
+
+    failures = []
+    for module in BOT_MODULES + SCRIPT_MODULES:
+        is_script = module in SCRIPT_MODULES
+        try:
+            total, times = _measure(module, max(1, args.runs))
+        except RuntimeError as exc:
+            failures.append(str(exc))
+            continue
+        print(f"{module:28s} {total:8.1f}ms  {_heaviest(times, module)}")
+
+        limit = args.max_script_ms if is_script else args.max_ms
+        if limit and total > limit:
+            failures.append(f"{module} took {total:.1f}ms, limit is {limit:.0f}ms")
+        if is_script:
+            loaded = [name for name in SCRIPT_FORBIDDEN if name in times]
+            if loaded:
+                failures.append(f"{module} imports {', '.join(loaded)}")
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare update throughput of polling and webhook ingestion against a fake Bot API.
+
+Runs the real dispatcher and handlers, so point `DATABASE_URL` at a scratch
+database before running:
+
+    DATABASE_URL=sqlite+aiosqlite:///bench.sqlite3 python -m scripts.bench_ingest -n 2000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from scripts.fake_bot_api import FakeBotAPI, make_start_update
+
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+# The fake Bot API has no flood limits; measure the bot, not Telegram's quotas.
+os.environ.setdefault("OUTBOUND_GLOBAL_RATE", "1000000")
+
+TIMEOUT = 300
+
+
+async def _bench_polling(api: FakeBotAPI, updates: list[dict]) -> float:
+    from app.bot import create_app, create_bot, router
+
+    app = create_app()
+    bot = create_bot()
+    polling = asyncio.create_task(
+        router.start_polling(bot, handle_signals=False, close_bot_session=False)
+    )
+    baseline = api.calls.get("sendMessage", 0)
+    started = time.perf_counter()
+    for update in updates:
+        api.updates.put_nowait(update)
+    try:
+        await asyncio.wait_for(api.wait_for("sendMessage", baseline + len(updates)), TIMEOUT)
+    finally:
+        elapsed = time.perf_counter() - started
+        await router.stop_polling()
+    await polling
+    await api.wait_idle()
+    await app.outbound.close()
+    await bot.session.close()
+    return elapsed
+
+
+async def _bench_webhook(api: FakeBotAPI, updates: list[dict], port: int) -> float:
+    from aiohttp import web
+
+    from app.bot import create_app, create_bot, router
+    from app.webhook import WebhookHandler
+
+    app = create_app()
+    bot = create_bot()
+    handler = WebhookHandler(
+        router, bot, secret_token="bench", max_concurrency=app.settings.max_concurrent_updates
+    )
+    runner = web.AppRunner(handler.create_app("/webhook"))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    baseline = api.calls.get("sendMessage", 0)
+    started = time.perf_counter()
+    await api.push_webhook(f"http://127.0.0.1:{port}/webhook", updates, secret_token="bench")
+    try:
+        await asyncio.wait_for(api.wait_for("sendMessage", baseline + len(updates)), TIMEOUT)
+    finally:
+        elapsed = time.perf_counter() - started
+        await runner.cleanup()
+        await handler.drain()
+        await api.wait_idle()
+        await app.outbound.close()
+        await bot.session.close()
+    return elapsed
+
+
+async def _run(args: argparse.Namespace) -> None:
+    api = FakeBotAPI()
+    os.environ["TELEGRAM_API_URL"] = await api.start()
+
+    from app import models  # noqa: F401 - ensure models are registered
+    from app.db import init_db
+
+    await init_db()
+    first_id = random.randint(10**9, 2 * 10**9)
+    modes = ["polling", "webhook"] if args.mode == "both" else [args.mode]
+    try:
+        for index, mode in enumerate(modes):
+            offset = first_id + index * args.updates
+            updates = [make_start_update(offset + i, offset + i) for i in range(args.updates)]
+            if mode == "polling":
+                elapsed = await _bench_polling(api, updates)
+            else:
+                elapsed = await _bench_webhook(api, updates, args.port)
+            print(f"{mode:8s} {len(updates)} updates in {elapsed:.2f}s ({len(updates) / elapsed:.0f} updates/s)")
+    finally:
+        await api.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark polling vs webhook update ingestion.")
+    parser.add_argument("-n", "--updates", type=int, default=1000, help="Updates per mode")
+    parser.add_argument("--mode", choices=["polling", "webhook", "both"], default="both")
+    parser.add_argument("--port", type=int, default=8089, help="Local webhook port")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Measure the daily reading count query against a large `readings` table.
+
+Fills the database from `DATABASE_URL` with synthetic users and readings, then
+times the count used by the daily limit with and without the migration index.
+Run it against a scratch database only:
+
+    python -m scripts.bench_reading_count --rows 5000000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import false, func, select, text
+
+from app import models  # noqa: F401 - ensure models are registered
+from app.db import get_engine, init_db
+from app.migrations import MIGRATIONS
+from app.models import Reading
+
+TELEGRAM_ID_BASE = 9_000_000_000_000
+
+_FILL_SQL = {
+    "postgresql": (
+        """
+        INSERT INTO users (telegram_id, username)
+        SELECT :base + g, 'bench' FROM generate_series(1, :users) AS g
+        ON CONFLICT (telegram_id) DO NOTHING
+        """,
+        """
+        INSERT INTO readings (user_id, arcana_id, prediction_index, variant, is_spontaneous, created_at)
+        SELECT u.first_id + (g % :users), g % 22, g % 4, 1, g % 10 = 0,
+               now() - random() * :days * interval '1 day'
+        FROM generate_series(1, :rows) AS g,
+             (SELECT min(id) AS first_id FROM users WHERE telegram_id > :base) AS u
+        """,
+    ),
+    "sqlite": (
+        """
+        WITH RECURSIVE g(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM g WHERE n < :users)
+        INSERT OR IGNORE INTO users (telegram_id, username) SELECT :base + n, 'bench' FROM g
+        """,
+        """
+        WITH RECURSIVE g(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM g WHERE n < :rows)
+        INSERT INTO readings (user_id, arcana_id, prediction_index, variant, is_spontaneous, created_at)
+        SELECT u.first_id + (n % :users), n % 22, n % 4, 1, n % 10 = 0,
+               strftime('%Y-%m-%d %H:%M:%f', 'now', '-' || (abs(random()) % (:days * 86400)) || ' seconds')
+        FROM g, (SELECT min(id) AS first_id FROM users WHERE telegram_id > :base) AS u
+        """,
+    ),
+}
+
+
+async def _fill(users: int, rows: int, days: int) -> None:
+    users_sql, readings_sql = _FILL_SQL[get_engine().dialect.name]
+    params = {"base": TELEGRAM_ID_BASE, "users": users, "rows": rows, "days": days}
+    started = time.perf_counter()
+    async with get_engine().begin() as conn:
+        await conn.execute(text(users_sql), params)
+        await conn.execute(text(readings_sql), params)
+        await conn.execute(text("ANALYZE"))
+    print(f"Inserted {rows} readings for {users} users in {time.perf_counter() - started:.1f}s")
+
+
+async def _sample_user_ids(samples: int) -> list[int]:
+    async with get_engine().connect() as conn:
+        result = await conn.execute(
+            text("SELECT id FROM users WHERE telegram_id > :base"), {"base": TELEGRAM_ID_BASE}
+        )
+        user_ids = list(result.scalars())
+    return random.sample(user_ids, min(samples, len(user_ids)))
+
+
+async def _time_counts(user_ids: list[int]) -> list[float]:
+    start = datetime.combine(datetime.now(timezone.utc).date(), datetime.min.time(), tzinfo=timezone.utc)
+    end = start + timedelta(days=1)
+    timings = []
+    async with get_engine().connect() as conn:
+        for user_id in user_ids:
+            stmt = (
+                select(func.count(Reading.id))
+                .where(Reading.user_id == user_id)
+                .where(Reading.is_spontaneous == false())
+                .where(Reading.created_at >= start)
+                .where(Reading.created_at < end)
+            )
+            started = time.perf_counter()
+            await conn.execute(stmt)
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) > 1 else ordered[0]
+    print(
+        f"{label:14s} n={len(ordered)} mean={statistics.fmean(ordered):.2f}ms "
+        f"p50={statistics.median(ordered):.2f}ms p95={p95:.2f}ms max={ordered[-1]:.2f}ms"
+    )
+
+
+async def _run(args: argparse.Namespace) -> None:
+    await init_db()
+    if not args.skip_fill:
+        await _fill(args.users, args.rows, args.days)
+    user_ids = await _sample_user_ids(args.samples)
+
+    create_index = MIGRATIONS[0].statements[0]
+    async with get_engine().begin() as conn:
+        await conn.execute(text("DROP INDEX IF EXISTS ix_readings_user_created_regular"))
+    _report("without index", await _time_counts(user_ids))
+
+    async with get_engine().begin() as conn:
+        await conn.execute(create_index)
+        await conn.execute(text("ANALYZE"))
+    _report("with index", await _time_counts(user_ids))
+    await get_engine().dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the daily reading count query.")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Readings to insert")
+    parser.add_argument("--users", type=int, default=100_000, help="Users to spread readings over")
+    parser.add_argument("--days", type=int, default=365, help="History length in days")
+    parser.add_argument("--samples", type=int, default=200, help="Count queries per run")
+    parser.add_argument("--skip-fill", action="store_true", help="Reuse previously inserted data")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Convert reading text to catalog ids ahead of deploying migration 3.
+
+The startup migration converts the whole table in one transaction while
+holding the migration lock. On a large table run this first; it commits
+every batch, can be interrupted and restarted, and leaves the migration
+nothing to do:
+
+    python -m scripts.compact_readings
+"""
+
+import asyncio
+from functools import partial
+
+from app import models  # noqa: F401 - ensure models are registered
+from app.db import get_engine
+from app.migrations import compact_readings
+
+
+async def _run() -> None:
+    engine = get_engine()
+    async with engine.connect() as conn:
+        await conn.run_sync(partial(compact_readings, commit_batches=True))
+        await conn.commit()
+    await engine.dispose()
+    print("Readings are stored as catalog ids.")
+
+
+if __name__ == "__main__":
+    asyncio.run(_run())
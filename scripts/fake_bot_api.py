@@ -0,0 +1,174 @@
+"""Minimal local stand-in for the Telegram Bot API used by benchmarks."""
+
+import asyncio
+import itertools
+import time
+
+from aiohttp import ClientSession, web
+
+
+def make_start_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+
+def make_callback_update(update_id: int, user_id: int, data: str, message_id: int) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": 1, "is_bot": True, "first_name": "Bench"},
+                "text": "",
+            },
+        },
+    }
+
+
+class FakeBotAPI:
+    """Serves `getUpdates` from an in-memory queue and records outgoing calls.
+
+    Callers can also wait for the answer to a specific callback query or for
+    the next message with an inline keyboard in a chat, which is what a user
+    waits for before tapping again.
+    """
+
+    def __init__(self) -> None:
+        self.updates: asyncio.Queue[dict] = asyncio.Queue()
+        self.calls: dict[str, int] = {}
+        self.sent = asyncio.Condition()
+        self._message_ids = itertools.count(1_000_000)
+        self._runner: web.AppRunner | None = None
+        self._answers: dict[str, asyncio.Future] = {}
+        self._keyboards: dict[int, asyncio.Future] = {}
+        self._messages: dict[int, asyncio.Future] = {}
+        self.base_url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def wait_for(self, method: str, count: int) -> None:
+        async with self.sent:
+            await self.sent.wait_for(lambda: self.calls.get(method, 0) >= count)
+
+    def expect_answer(self, callback_query_id: str) -> asyncio.Future:
+        """Future resolved with the answer's text (True without one) to the callback query."""
+        future = asyncio.get_running_loop().create_future()
+        self._answers[callback_query_id] = future
+        return future
+
+    def expect_keyboard(self, chat_id: int) -> asyncio.Future:
+        """Future resolved with the id of the next message with a keyboard in the chat."""
+        future = asyncio.get_running_loop().create_future()
+        self._keyboards[chat_id] = future
+        return future
+
+    def expect_message(self, chat_id: int) -> asyncio.Future:
+        """Future resolved by the next message in the chat; True if it has a keyboard."""
+        future = asyncio.get_running_loop().create_future()
+        self._messages[chat_id] = future
+        return future
+
+    async def wait_idle(self, quiet: float = 0.2) -> None:
+        """Wait until no Bot API call arrived for `quiet` seconds."""
+        while True:
+            before = sum(self.calls.values())
+            await asyncio.sleep(quiet)
+            if sum(self.calls.values()) == before:
+                return
+
+    async def _record(self, method: str) -> None:
+        async with self.sent:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self.sent.notify_all()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+
+        if method == "getUpdates":
+            result = await self._get_updates(float(params.get("timeout") or 0))
+        elif method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif method in {"sendMessage", "editMessageText"}:
+            chat_id = int(params["chat_id"])
+            result = {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+            if params.get("reply_markup"):
+                self._resolve(self._keyboards, chat_id, result["message_id"])
+            self._resolve(self._messages, chat_id, bool(params.get("reply_markup")))
+        else:
+            if method == "answerCallbackQuery":
+                self._resolve(
+                    self._answers, params.get("callback_query_id"), params.get("text") or True
+                )
+            result = True
+
+        await self._record(method)
+        return web.json_response({"ok": True, "result": result})
+
+    @staticmethod
+    def _resolve(waiters: dict, key, value) -> None:  # noqa: ANN001
+        future = waiters.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(value)
+
+    async def _get_updates(self, timeout: float) -> list[dict]:
+        batch: list[dict] = []
+        try:
+            batch.append(await asyncio.wait_for(self.updates.get(), timeout=timeout or 0.1))
+        except asyncio.TimeoutError:
+            return batch
+        while not self.updates.empty() and len(batch) < 100:
+            batch.append(self.updates.get_nowait())
+        return batch
+
+    async def push_webhook(
+        self, url: str, updates: list[dict], *, secret_token: str = "", connections: int = 40
+    ) -> None:
+        """Deliver updates the way Telegram does: over a limited connection pool."""
+        headers = {"X-Telegram-Bot-Api-Secret-Token": secret_token} if secret_token else {}
+        pending = iter(updates)
+
+        async def deliver(session: ClientSession) -> None:
+            for update in pending:
+                async with session.post(url, json=update, headers=headers) as response:
+                    response.raise_for_status()
+
+        async with ClientSession() as session:
+            await asyncio.gather(*(deliver(session) for _ in range(connections)))
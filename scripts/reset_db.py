@@ -3,14 +3,19 @@
 import asyncio
 
 from app import models  # noqa: F401 - ensure models are registered
-from app.db import Base, engine
+from app.db import Base, get_engine
+from app.migrations import apply_migrations, lock_schema
 
 
 async def reset_db() -> None:
+    engine = get_engine()
     async with engine.begin() as conn:
+        await conn.run_sync(lock_schema)
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
-    print("Database schema has been dropped and recreated.")
+        applied = await conn.run_sync(apply_migrations)
+    await engine.dispose()
+    print(f"Database schema has been dropped and recreated (migrations: {applied}).")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+"""Restore a backup set made by `scripts.backup_db`.
+
+The dump is restored with `pg_restore -j`, then the user chunks are applied
+in order, the reading chunks are loaded concurrently and the id sequences
+are moved past them. Run it
+against an empty database, or pass `--clean` to drop existing objects first:
+
+    python -m scripts.restore_db backups/tarobot-20240501-030000 -j 4
+
+Every stage prints its duration.
+"""
+
+import argparse
+import asyncio
+import subprocess
+import time
+from pathlib import Path
+
+from app.backups import Manifest, load_readings, load_users, pg_connection, reset_sequences
+from app.config import get_settings
+from app.db import get_engine
+
+
+def _report(stage: str, started: float, detail: str = "") -> None:
+    print(f"{stage:12s} {time.perf_counter() - started:8.2f}s  {detail}".rstrip())
+
+
+def _build_pg_restore_command(
+    dump_path: Path, *, jobs: int, clean: bool
+) -> tuple[list[str], dict[str, str]]:
+    connection, env, database = pg_connection(get_settings().database_url)
+    cmd = ["pg_restore", *connection, "-d", database, "-j", str(jobs)]
+    if clean:
+        cmd += ["--clean", "--if-exists"]
+    cmd.append(str(dump_path))
+    return cmd, env
+
+
+async def _load_chunks(backup_set: Path, manifest: Manifest, jobs: int) -> None:
+    engine = get_engine()
+    slots = asyncio.Semaphore(jobs)
+
+    async def load(name: str) -> None:
+        async with slots:
+            started = time.perf_counter()
+            rows = await load_readings(engine, backup_set / name)
+            _report("chunk", started, f"{rows} readings from {name}")
+
+    try:
+        # Readings need their users; later user chunks overwrite earlier ones.
+        for name in manifest.user_chunks:
+            started = time.perf_counter()
+            rows = await load_users(engine, backup_set / name)
+            _report("users", started, f"{rows} users from {name}")
+        await asyncio.gather(*(load(name) for name in manifest.chunks))
+        await reset_sequences(engine)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Restore a Tarot bot backup set.")
+    parser.add_argument("backup_set", type=Path, help="Backup set directory")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Parallel restore jobs")
+    parser.add_argument(
+        "--clean", action="store_true", help="Drop existing database objects first"
+    )
+    parser.add_argument(
+        "--skip-chunks", action="store_true", help="Restore the dump only"
+    )
+    args = parser.parse_args()
+    jobs = max(1, args.jobs)
+    manifest = Manifest.read(args.backup_set)
+
+    total = time.perf_counter()
+    started = time.perf_counter()
+    cmd, env = _build_pg_restore_command(
+        args.backup_set / manifest.dump, jobs=jobs, clean=args.clean
+    )
+    subprocess.run(cmd, env=env, check=True)
+    _report("pg_restore", started, manifest.dump)
+
+    if (manifest.chunks or manifest.user_chunks) and not args.skip_chunks:
+        started = time.perf_counter()
+        asyncio.run(_load_chunks(args.backup_set, manifest, jobs))
+        _report("readings", started, f"{len(manifest.chunks)} chunks up to id {manifest.hwm}")
+    _report("total", total)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Print reading statistics from the daily rollup tables.
+
+Reads only the rollups, so it answers in the same time however many
+readings are stored. `--refresh` first rolls up readings that the bot has
+not processed yet (e.g. when it is not running):
+
+    python -m scripts.stats --days 14 --refresh
+"""
+
+import argparse
+import asyncio
+
+from app import models  # noqa: F401 - ensure models are registered
+from app.db import get_engine, get_sessionmaker, init_db
+from app.quota import utc_today
+from app.rollups import ReadingRollup, format_report, load_report
+
+
+async def _run(args: argparse.Namespace) -> None:
+    await init_db()
+    sessionmaker = get_sessionmaker()
+    if args.refresh:
+        await ReadingRollup(sessionmaker, settle=0).run_once()
+    async with sessionmaker() as session:
+        report = await load_report(session, utc_today(), days=args.days)
+    print(format_report(report))
+    await get_engine().dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show Tarot bot reading statistics.")
+    parser.add_argument("--days", type=int, default=7, help="Days of daily totals to show")
+    parser.add_argument(
+        "--refresh", action="store_true", help="Roll up pending readings before reporting"
+    )
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()